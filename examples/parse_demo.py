@@ -0,0 +1,112 @@
+"""
+Parses sample statements and checks them against the hand-built ASTs.
+
+    python examples/parse_demo.py
+"""
+
+from mini_snowflake.common.manifest import ColumnInfo
+from mini_snowflake.parser.models import (
+    AggExpr,
+    ColumnRef,
+    CreateQuery,
+    InsertQuery,
+    PredicateTerm,
+    SelectQuery,
+)
+from mini_snowflake.parser.parser import parse
+
+
+def main() -> None:
+    select_query_str = """
+        SELECT
+            event_type,
+            COUNT(*),
+            COUNT(user_id) as n_user_id_nonnull,
+            SUM(value) as total_value,
+            AVG(value) as avg_value,
+            MIN(event_time) as first_seen,
+            MAX(event_time) as last_seen
+        from events
+        where event_time >= '2025-01-01T00:00:00Z'
+            AND event_time <  '2025-02-01T00:00:00Z'
+            AND value >= 0
+            AND user_id IS NOT NULL
+        group by event_type
+    """
+
+    select_query_class = SelectQuery(
+        table="events",
+        select=[
+            ColumnRef(name="event_type"),
+            AggExpr(func="count", col="*"),
+            AggExpr(func="count", col="user_id", alias="n_user_id_nonnull"),
+            AggExpr(func="sum", col="value", alias="total_value"),
+            AggExpr(func="avg", col="value", alias="avg_value"),
+            AggExpr(func="min", col="event_time", alias="first_seen"),
+            AggExpr(func="max", col="event_time", alias="last_seen"),
+        ],
+        where=[
+            PredicateTerm(
+                col="event_time",
+                op=">=",
+                value="2025-01-01T00:00:00Z",
+            ),
+            PredicateTerm(
+                col="event_time",
+                op="<",
+                value="2025-02-01T00:00:00Z",
+            ),
+            PredicateTerm(
+                col="value",
+                op=">=",
+                value=0,
+            ),
+            PredicateTerm(
+                col="user_id",
+                op="is_not_null",
+                value=None,
+            ),
+        ],
+        group_by=["event_type"],
+    )
+
+    print(parse(select_query_str) == select_query_class)
+
+    create_query_str = """
+        CREATE TABLE events(
+            event_id    INT,
+            user_id     INT,
+            event_type  VARCHAR,
+            value       DOUBLE IS NOT NULL,
+            event_time  TIMESTAMP
+        ) IF NOT EXISTS
+    """
+
+    create_query_class = CreateQuery(
+        table="events",
+        schema=[
+            ColumnInfo(name="event_id", type="int"),
+            ColumnInfo(name="user_id", type="int"),
+            ColumnInfo(name="event_type", type="varchar"),
+            ColumnInfo(
+                name="value",
+                type="double",
+                nullable=False,
+            ),
+            ColumnInfo(name="event_time", type="timestamp"),
+        ],
+        if_not_exists=True,
+    )
+
+    print(parse(create_query_str) == create_query_class)
+
+    insert_query_str = "INSERT INTO events FROM data/path ROWS_PER_SHARD 2"
+    insert_query_class = InsertQuery(
+        table="events", src_path="data/path", rows_per_shard=2
+    )
+
+    print(parse(insert_query_str) == insert_query_class)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Prints the map, intermediate-reduce and final-reduce SQL for a sample query.
+
+    python examples/plan_demo.py
+"""
+
+from pathlib import Path
+
+from mini_snowflake.orchestrator.query_maker import (
+    create_final_reduce_job,
+    create_intermediate_reduce_job,
+    create_map_job,
+)
+from mini_snowflake.parser.models import ColumnRef, PredicateTerm, SelectQuery
+
+
+def main() -> None:
+    query = SelectQuery(
+        table="events",
+        select=[
+            ColumnRef(name="country"),
+            # AggExpr(func="count", col="*"),
+            # AggExpr(func="count", col="user_id", alias="n_user_id_nonnull"),
+            # AggExpr(func="sum", col="value", alias="total_value"),
+            # AggExpr(func="avg", col="value", alias="avg_value"),
+            # AggExpr(func="min", col="event_time", alias="first_seen"),
+            # AggExpr(func="max", col="event_time", alias="last_seen"),
+        ],
+        where=[
+            PredicateTerm(
+                col="event_time",
+                op=">=",
+                value="2025-01-01T00:00:00Z",
+            ),
+            PredicateTerm(
+                col="event_time",
+                op="<",
+                value="2025-02-01T00:00:00Z",
+            ),
+            PredicateTerm(
+                col="value",
+                op=">=",
+                value=0,
+            ),
+            PredicateTerm(
+                col="user_id",
+                op="is_not_null",
+                value=None,
+            ),
+        ],
+        group_by=None,  # ["event_type"],
+    )
+
+    shards = ["shard-0", "shard-1", "shard-2"]
+    data_path = "src/data"
+    tmp_dir = f"{data_path}/tmp"
+
+    map_jobs: list[tuple[str, Path]] = []
+    for s in shards:
+        sql, out = create_map_job(query, s, data_path, tmp_dir, fmt="parquet")
+        map_jobs.append((sql, out))
+
+    print("\n--- MAP ---\n")
+    for sql, out in map_jobs:
+        print(f"- {out}\n{sql}\n")
+
+    map_outputs = [out for _, out in map_jobs]
+
+    interm_sql, interm_out = create_intermediate_reduce_job(
+        query, map_outputs, tmp_dir, tag="r0", fmt="parquet"
+    )
+    print("\n--- INTERMEDIATE REDUCE ---\n")
+    print(f"- {interm_out}\n{interm_sql}\n")
+    final_sql, final_out = create_final_reduce_job(
+        query, [interm_out], out_path="src/data/out/final_events.parquet", fmt="parquet"
+    )
+    print("\n--- FINAL REDUCE ---\n")
+    print(f"- {final_out}\n{final_sql}\n")
+
+
+if __name__ == "__main__":
+    main()
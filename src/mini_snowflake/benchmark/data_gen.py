@@ -1,23 +1,36 @@
-from datetime import date, datetime, timezone
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from datetime import UTC, date, datetime
+from functools import lru_cache
 from pathlib import Path
-import random
-from typing import Any, Callable, Literal
+from random import Random
+from typing import Any, Literal
+import numpy as np
 from pydantic import BaseModel
 import yaml
 import pyarrow as pa
-import pyarrow.dataset as ds
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 from mini_snowflake.common.db_conn import DBConn
+from mini_snowflake.common.io_parquet import SHARD_WRITE_OPTIONS
 from mini_snowflake.common.manifest import ColumnInfo, Manifest
+from mini_snowflake.common.types import DUCKDB_TO_ARROW
 from mini_snowflake.common.utils import MSF_PATH
 from mini_snowflake.parser.parser import parse
 from mini_snowflake.worker.models import CreateRequest
-from mini_snowflake.worker.worker import DUCKDB_TO_ARROW, worker_create
+from mini_snowflake.worker.worker import worker_create
 
 class DataGenConfig(BaseModel):
     rows_per_shard: int
     num_shards: int
     db_path: str | Path
     create_ddl: str
+    # Defaults to rows_per_shard: one dense row group per shard file
+    rows_per_group: int | None = None
+    # Defaults to os.cpu_count()
+    num_workers: int | None = None
+    # Fixed seed makes runs reproducible; None draws fresh OS entropy
+    seed: int | None = None
 
 SynthDataType = Literal[
     "int",
@@ -28,6 +41,13 @@ SynthDataType = Literal[
     "timestamp",
 ]
 
+# Uniformly distributed synthetic columns: written uncompressed
+INCOMPRESSIBLE_SYNTH_TYPES: frozenset[SynthDataType] = frozenset({"int", "float", "bool"})
+
+GenerateColumnsFn = Callable[
+    [Manifest, int, np.random.Generator, datetime], list[pa.Array]
+]
+
 def load_config(config_path: str) -> DataGenConfig:
     with open(config_path, "r") as f:
         config_dict = yaml.safe_load(f)
@@ -36,64 +56,181 @@ def load_config(config_path: str) -> DataGenConfig:
     config = DataGenConfig(**config_dict)
     return config
 
+# Row-at-a-time path, kept for callers that want plain Python rows
+_SCALAR_RNG = Random()
+
+_SCALAR_GENERATORS: dict[str, Callable[[str], Any]] = {
+    "int": lambda name: _SCALAR_RNG.randint(0, 100),
+    "float": lambda name: round(_SCALAR_RNG.uniform(0, 100), 2),
+    "bool": lambda name: _SCALAR_RNG.random() < 0.5,
+    "varchar": lambda name: f"{name}_{_SCALAR_RNG.randint(0, 10_000)}",
+    "date": lambda name: date.today(),
+    "timestamp": lambda name: datetime.now(tz=UTC),
+}
+
 def generate_synthetic_value(col: ColumnInfo) -> Any:
-    return {
-        "int": random.randint(0, 100),
-        "float": round(random.uniform(0, 100), 2),
-        "bool": random.choice([True, False]),
-        "varchar": f"{col.name}_{random.randint(0, 10_000)}",
-        "date": date.today(),
-        "timestamp": datetime.now(tz=timezone.utc),
-    }[col.type]
+    return _SCALAR_GENERATORS[col.type](col.name)
+
+@lru_cache(maxsize=32)
+def _row_generators(
+    schema_tuple: tuple[tuple[str, str, bool], ...],
+) -> tuple[tuple[str, Callable[[str], Any]], ...]:
+    return tuple((name, _SCALAR_GENERATORS[col_type]) for name, col_type, _ in schema_tuple)
 
 def generate_row(manifest: Manifest) -> dict[str, Any]:
-    return {
-        col.name: generate_synthetic_value(col)
-        for col in manifest.schema
-    }
+    return {name: gen(name) for name, gen in _row_generators(manifest.schema_tuple)}
+
+@lru_cache(maxsize=8)
+def _constant_column(col_type: str, n: int, now: datetime) -> pa.Array:
+    """
+    Date/timestamp columns only depend on the run's `now`, so every shard built in
+    this process shares one immutable Arrow array per (type, length).
+    """
+    if col_type == "date":
+        values = np.full(n, np.datetime64(now.date(), "D"))
+    else:
+        values = np.full(n, np.datetime64(now.replace(tzinfo=None), "us"))
+    return pa.array(values, type=DUCKDB_TO_ARROW[col_type])
+
+def generate_synthetic_column(
+    name: str, col_type: str, n: int, rng: np.random.Generator, now: datetime
+) -> pa.Array:
+    """
+    Columnar counterpart of `generate_synthetic_value`: draws `n` values at once.
+    Date/timestamp columns are filled with the caller's `now` snapshot.
+    """
+    if col_type == "int":
+        values = rng.integers(0, 101, size=n, dtype=np.int32)
+    elif col_type == "float":
+        values = rng.uniform(0, 100, size=n).round(2).astype(np.float32)
+    elif col_type == "bool":
+        values = rng.choice([True, False], size=n)
+    elif col_type == "varchar":
+        # "<name>_<id>" built by Arrow kernels straight into the offsets/data buffers
+        ids = pa.array(rng.integers(0, 10_001, size=n, dtype=np.int32))
+        return pc.binary_join_element_wise(f"{name}_", pc.cast(ids, pa.string()), "")
+    elif col_type in ("date", "timestamp"):
+        return _constant_column(col_type, n, now)
+    else:
+        raise ValueError(f"Unsupported synthetic type: {col_type}")
+    return pa.array(values, type=DUCKDB_TO_ARROW[col_type])
+
+def generate_columns(
+    manifest: Manifest,
+    n: int,
+    rng: np.random.Generator | None = None,
+    now: datetime | None = None,
+) -> list[pa.Array]:
+    rng = rng if rng is not None else np.random.Generator(np.random.PCG64())
+    now = now if now is not None else datetime.now(tz=UTC)
+    return [
+        generate_synthetic_column(name, col_type, n, rng, now)
+        for name, col_type, _ in manifest.schema_tuple
+    ]
 
-def manifest_to_arrow_schema(manifest) -> pa.Schema:
+@lru_cache(maxsize=32)
+def _arrow_schema(schema_tuple: tuple[tuple[str, str, bool], ...]) -> pa.Schema:
     fields: list[pa.Field] = []
-    for col in manifest.schema:
-        arrow_type = DUCKDB_TO_ARROW.get(col.type)
+    for name, col_type, nullable in schema_tuple:
+        arrow_type = DUCKDB_TO_ARROW.get(col_type)
         if arrow_type is None:
-            raise ValueError(f"Unsupported type for Parquet: {col.type}")
+            raise ValueError(f"Unsupported type for Parquet: {col_type}")
         # Arrow Field.nullable=True means "may be null". If your col is non-nullable, set False.
-        fields.append(pa.field(col.name, arrow_type, nullable=col.nullable))
+        fields.append(pa.field(name, arrow_type, nullable=nullable))
     return pa.schema(fields)
 
 
+def manifest_to_arrow_schema(manifest: Manifest) -> pa.Schema:
+    return _arrow_schema(manifest.schema_tuple)
+
+
+def _shard_write_options(manifest: Manifest) -> dict[str, Any]:
+    """
+    SHARD_WRITE_OPTIONS with per-column codecs: uniform random numerics barely
+    compress, so only spend zstd on the columns where it pays off.
+    """
+    codec = SHARD_WRITE_OPTIONS["compression"]
+    level = SHARD_WRITE_OPTIONS["compression_level"]
+    compression: dict[str, str] = {}
+    compression_level: dict[str, int] = {}
+    for name, col_type, _ in manifest.schema_tuple:
+        if col_type in INCOMPRESSIBLE_SYNTH_TYPES:
+            compression[name] = "none"
+        else:
+            compression[name] = codec
+            compression_level[name] = level
+    return {
+        **SHARD_WRITE_OPTIONS,
+        "compression": compression,
+        "compression_level": compression_level,
+    }
+
+
+def _gen_shard(
+    shard_i: int,
+    seed: np.random.SeedSequence,
+    now: datetime,
+    manifest: Manifest,
+    generate_columns_fn: GenerateColumnsFn,
+    schema: pa.Schema,
+    write_options: dict[str, Any],
+    rows_per_shard: int,
+    rows_per_group: int,
+    dataset_dir: Path,
+) -> str:
+    """
+    Generate and write a single shard. Top-level so it can run in a worker process.
+    """
+    rng = np.random.Generator(np.random.PCG64(seed))
+    data = pa.Table.from_arrays(
+        generate_columns_fn(manifest, rows_per_shard, rng, now), schema=schema
+    )
+    shard_name = f"tmp_shard-{shard_i}.parquet"
+    with pq.ParquetWriter(dataset_dir / shard_name, schema, **write_options) as writer:
+        writer.write_table(data, row_group_size=rows_per_group)
+    return shard_name
+
+
 def write_sharded_parquet(
     *,
     manifest: Manifest,
-    generate_row_fn: Callable[[Any], dict[str, Any]],
+    generate_columns_fn: GenerateColumnsFn,
     table_name: str,
     conn: DBConn,
     config: DataGenConfig,
-) -> list[Path]:
+) -> tuple[Path, list[str]]:
     dataset_dir: Path = Path(conn.path) / table_name
     dataset_dir.mkdir(parents=True, exist_ok=True)
 
     schema = manifest_to_arrow_schema(manifest)
-    total_rows = config.num_shards * config.rows_per_shard
-
-    rows = [generate_row_fn(manifest) for _ in range(total_rows)]
-    data = pa.Table.from_pylist(rows, schema=schema)
-
-    write_kwargs: dict[str, Any] = dict(
-        data=data,
-        base_dir=str(dataset_dir),
-        format="parquet",
-        max_rows_per_file=config.rows_per_shard,
-        max_rows_per_group=config.rows_per_shard,
-        existing_data_behavior="overwrite_or_ignore",
-        basename_template="tmp_shard-{i}.parquet",
-    )
+    write_options = _shard_write_options(manifest)
+    rows_per_group = config.rows_per_group or config.rows_per_shard
+    # Independent, reproducible streams per shard derived from a single seed
+    seeds = np.random.SeedSequence(config.seed).spawn(config.num_shards)
+    # A single snapshot for every date/timestamp cell of every shard
+    now = datetime.now(tz=UTC)
 
-    ds.write_dataset(**write_kwargs)
+    # Shards are independent: each worker process holds one shard in memory at a time.
+    with ProcessPoolExecutor(max_workers=config.num_workers) as ex:
+        futures = [
+            ex.submit(
+                _gen_shard,
+                i,
+                seeds[i],
+                now,
+                manifest,
+                generate_columns_fn,
+                schema,
+                write_options,
+                config.rows_per_shard,
+                rows_per_group,
+                dataset_dir,
+            )
+            for i in range(config.num_shards)
+        ]
+        shards = [f.result() for f in futures]
 
-    written_files: list[Path] = sorted(dataset_dir.glob("*.parquet"))
-    return dataset_dir, [str(f).split("/")[-1] for f in written_files]
+    return dataset_dir, shards
 
 if __name__=="__main__":
     config = load_config(MSF_PATH / "benchmark/data_gen.yml")
@@ -113,7 +250,7 @@ if __name__=="__main__":
     manifest = Manifest.load(manifest_path)
     _, shards = write_sharded_parquet(
         manifest=manifest,
-        generate_row_fn=generate_row,
+        generate_columns_fn=generate_columns,
         table_name=query.table,
         conn=conn,
         config=config,
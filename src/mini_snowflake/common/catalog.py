@@ -1,10 +1,10 @@
 from __future__ import annotations
 
-import json
 from pathlib import Path
 from typing import Any
 
-from mini_snowflake.common.utils import _atomic_write_text, _curr_date
+import orjson
+from mini_snowflake.common.utils import _atomic_write_bytes, _curr_date
 from pydantic import ConfigDict, Field, field_validator
 from pydantic.dataclasses import dataclass
 
@@ -43,26 +43,26 @@ class Catalog:
 
     @classmethod
     def from_dict(cls, d: dict[str, Any]) -> Catalog:
-        raw_tables = dict(d.get("tables", {}))
-        d2 = dict(d)
-        d2["tables"] = {k: TableEntry.from_dict(v) for k, v in raw_tables.items()}
-        return cls(**d2)
+        # Nested table dicts are validated into TableEntry in the same pass
+        return cls(**d)
 
     @classmethod
     def load(cls, catalog_path: str | Path) -> Catalog:
         catalog_path = Path(catalog_path)
         if not catalog_path.exists():
             return cls()
-        data = json.loads(catalog_path.read_text(encoding="utf-8"))
+        data = orjson.loads(catalog_path.read_bytes())
         return cls.from_dict(data)
 
     def save(self, catalog_path: str | Path) -> Path:
         catalog_path = Path(catalog_path)
-        text = (
-            json.dumps(self.to_dict(), ensure_ascii=False, indent=2, sort_keys=True)
-            + "\n"
+        data = (
+            orjson.dumps(
+                self.to_dict(), option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS
+            )
+            + b"\n"
         )
-        _atomic_write_text(catalog_path, text)
+        _atomic_write_bytes(catalog_path, data)
         return catalog_path
 
     def create_table(self, table_name: str, table_id: str) -> None:
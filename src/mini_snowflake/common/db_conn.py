@@ -1,6 +1,18 @@
+import fcntl
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
 
 from mini_snowflake.common.catalog import Catalog
+from mini_snowflake.common.manifest import Manifest
+
+# (db path, table) -> insert lock. Module-level and never cleared, so every
+# DBConn for a db, cached or not, serializes on the same lock per table.
+# Other worker processes are kept out by a flock on the table's .lock file.
+_TABLE_LOCKS: dict[tuple[str, str], threading.Lock] = {}
+_TABLE_LOCKS_GUARD = threading.Lock()
 
 
 class DBConn:
@@ -16,8 +28,89 @@ class DBConn:
         # Crear catalog
         self.catalog_path = self.path / "catalog.json"
 
-        if self.catalog_path.exists():
-            self.catalog = Catalog.load(self.catalog_path)
-        else:
-            self.catalog = Catalog()
-            self.catalog.save(self.catalog_path)
+        if not self.catalog_path.exists():
+            Catalog().save(self.catalog_path)
+        self._catalog: Catalog | None = None
+        self._catalog_stamp: tuple[int, int] | None = None
+        self._manifests: dict[str, tuple[tuple[int, int, int], Manifest]] = {}
+
+    @property
+    def catalog(self) -> Catalog:
+        """
+        Re-read only when catalog.json changed since the last read, so a long-lived
+        conn still sees tables created or dropped by other workers.
+        """
+        try:
+            st = self.catalog_path.stat()
+            stamp = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            stamp = None
+        if self._catalog is None or stamp != self._catalog_stamp:
+            self._catalog = Catalog.load(self.catalog_path)
+            self._catalog_stamp = stamp
+        return self._catalog
+
+    def manifest_path(self, table: str) -> Path:
+        return self.path / table / "manifest.json"
+
+    def manifest(self, table: str) -> Manifest:
+        """
+        Cached manifest of `table`, re-read only when manifest.json changed.
+        The returned object is shared: mutate it only under `table_lock`.
+        """
+        path = self.manifest_path(table)
+        stamp = _file_stamp(path)
+        cached = self._manifests.get(table)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        manifest = Manifest.load(path)
+        self._manifests[table] = (stamp, manifest)
+        return manifest
+
+    def save_manifest(self, table: str, manifest: Manifest) -> None:
+        path = manifest.save(self.manifest_path(table))
+        self._manifests[table] = (_file_stamp(path), manifest)
+
+    def forget_manifest(self, table: str) -> None:
+        self._manifests.pop(table, None)
+
+    def reset_cache(self) -> None:
+        """
+        Drops the cached catalog and manifests, e.g. after a failed task may have
+        left an unsaved edit on them; the next access re-reads from disk.
+        """
+        self._catalog = None
+        self._catalog_stamp = None
+        self._manifests.clear()
+
+    @contextmanager
+    def table_lock(self, table: str) -> Iterator[None]:
+        """
+        Serializes read-modify-write of one table's shards and manifest, across
+        threads and across worker processes sharing the db directory.
+        """
+        key = (str(self.path.resolve()), table)
+        with _TABLE_LOCKS_GUARD:
+            lock = _TABLE_LOCKS.setdefault(key, threading.Lock())
+        # Thread lock first so at most one thread per process blocks on the flock
+        with lock, open(self.path / table / ".lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _file_stamp(path: Path) -> tuple[int, int, int]:
+    # Manifests are replaced by rename, so the inode changes on every save even
+    # when another process rewrites one within the same mtime tick
+    st = path.stat()
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+@lru_cache(maxsize=64)
+def get_db_conn(path: str) -> DBConn:
+    """
+    Process-wide DBConn per db path.
+    """
+    return DBConn(path)
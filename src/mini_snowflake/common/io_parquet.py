@@ -1,7 +1,22 @@
+import os
 from pathlib import Path
+from typing import Any
 
-import duckdb
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Writer settings shared by every table shard (pq.ParquetWriter / make_write_options)
+SHARD_WRITE_OPTIONS: dict[str, Any] = {
+    "compression": "zstd",
+    "compression_level": 3,
+    "use_dictionary": True,
+    "data_page_version": "2.0",
+    "write_statistics": True,
+    # Page-level CRCs/indexes are extra encode work no reader here consumes
+    "write_page_checksum": False,
+    "write_page_index": False,
+}
 
 
 def delete_parquet(parquet_path: str | Path) -> None:
@@ -22,23 +37,10 @@ def write_parquet_overwrite(df: pd.DataFrame, parquet_path: str | Path) -> Path:
     parquet_path.parent.mkdir(parents=True, exist_ok=True)
 
     # Create
-    con = duckdb.connect()
-    try:
-        con.register("df", df)
-
-        con.execute(
-            """
-            COPY (
-                SELECT *
-                FROM df
-            )
-            TO ?
-            (FORMAT PARQUET)
-            """,
-            [str(parquet_path)],
-        )
-    finally:
-        con.close()
+    table = pa.Table.from_pandas(df, preserve_index=False, nthreads=os.cpu_count())
+    pq.write_table(
+        table, parquet_path, compression="zstd", row_group_size=max(1, len(df))
+    )
 
     return parquet_path
 
@@ -49,13 +51,9 @@ def read_parquet(parquet_path: str | Path) -> pd.DataFrame:
     if not parquet_path.exists():
         raise FileNotFoundError(parquet_path)
 
-    con = duckdb.connect()
-    try:
-        df = con.execute(
-            "SELECT * FROM read_parquet(?)",
-            [str(parquet_path)],
-        ).df()
-    finally:
-        con.close()
-
+    # One block per column skips pandas' consolidation copy, which lets
+    # self_destruct free each Arrow column as soon as it is converted
+    df: pd.DataFrame = pq.read_table(parquet_path).to_pandas(
+        split_blocks=True, self_destruct=True
+    )
     return df
@@ -1,11 +1,12 @@
 from __future__ import annotations
 
-import json
 import uuid
+from functools import cached_property
 from pathlib import Path
 from typing import Any, Literal
 
-from mini_snowflake.common.utils import _atomic_write_text, _curr_date
+import orjson
+from mini_snowflake.common.utils import _atomic_write_bytes, _curr_date
 from pydantic import ConfigDict, Field
 from pydantic.dataclasses import dataclass
 
@@ -60,6 +61,34 @@ class ColumnInfo:
         return {"name": self.name, "type": self.type, "nullable": self.nullable}
 
 
+ScalarType = int | float | str
+
+
+@dataclass(frozen=True, config=ConfigDict(extra="forbid"))
+class ShardStats:
+    """
+    Row count plus per-column null counts and min/max bounds of one shard.
+    Columns without usable statistics are simply absent from the dicts.
+    """
+
+    rows: int
+    null_counts: dict[str, int] = Field(default_factory=dict)
+    mins: dict[str, ScalarType] = Field(default_factory=dict)
+    maxs: dict[str, ScalarType] = Field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, d: dict[str, Any]) -> ShardStats:
+        return cls(**d)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "null_counts": dict(self.null_counts),
+            "mins": dict(self.mins),
+            "maxs": dict(self.maxs),
+        }
+
+
 @dataclass(config=ConfigDict(extra="forbid"))
 class Manifest:
     manifest_version: int = 1
@@ -69,6 +98,8 @@ class Manifest:
     created_at: str = Field(default_factory=_curr_date)
     schema: list[ColumnInfo] = Field(default_factory=list)
     shards: list[str] = Field(default_factory=list)
+    # Keyed by shard name; shards written before stats existed have no entry
+    shard_stats: dict[str, ShardStats] = Field(default_factory=dict)
 
     def to_dict(self) -> dict[str, Any]:
         return {
@@ -79,23 +110,27 @@ class Manifest:
             "created_at": self.created_at,
             "schema": [c.to_dict() for c in self.schema],
             "shards": list(self.shards),
+            "shard_stats": {k: v.to_dict() for k, v in self.shard_stats.items()},
         }
 
+    @cached_property
+    def schema_tuple(self) -> tuple[tuple[str, ColType, bool], ...]:
+        """
+        (name, type, nullable) snapshot of the schema, computed once per manifest.
+        """
+        return tuple((c.name, c.type, c.nullable) for c in self.schema)
+
     @classmethod
     def load(cls, manifest_path: str | Path) -> Manifest:
         manifest_path = Path(manifest_path)
-        data = json.loads(manifest_path.read_text(encoding="utf-8"))
-
-        data["schema"] = [ColumnInfo.from_dict(c) for c in data.get("schema", [])]
-        data["shards"] = list(data.get("shards", []))
+        data = orjson.loads(manifest_path.read_bytes())
 
+        # Nested schema dicts are validated into ColumnInfo in the same pass
         return cls(**data)
 
     def save(self, manifest_path: str | Path) -> Path:
         manifest_path = Path(manifest_path)
-        text = (
-            json.dumps(self.to_dict(), ensure_ascii=False, indent=2, sort_keys=True)
-            + "\n"
-        )
-        _atomic_write_text(manifest_path, text)
+        # Compact: per-shard stats make indentation roughly double the file size
+        data = orjson.dumps(self.to_dict(), option=orjson.OPT_SORT_KEYS) + b"\n"
+        _atomic_write_bytes(manifest_path, data)
         return manifest_path
@@ -0,0 +1,46 @@
+import pyarrow as pa
+
+# DuckDB column type -> Arrow type used for shard files
+DUCKDB_TO_ARROW: dict[str, pa.DataType] = {
+    # integers
+    "tinyint": pa.int8(),
+    "smallint": pa.int16(),
+    "integer": pa.int32(),
+    "int": pa.int32(),
+    "bigint": pa.int64(),
+    "hugeint": pa.int64(),
+    "bignum": pa.decimal128(38, 0),
+    "utinyint": pa.uint8(),
+    "usmallint": pa.uint16(),
+    "uinteger": pa.uint32(),
+    "ubigint": pa.uint64(),
+    "uhugeint": pa.uint64(),
+    # floats / decimals
+    "float": pa.float32(),
+    "real": pa.float32(),
+    "double": pa.float64(),
+    "decimal": pa.decimal128(
+        38, 10
+    ),  # if you don't store precision/scale, pick a default
+    "numeric": pa.decimal128(38, 10),
+    # boolean
+    "boolean": pa.bool_(),
+    "bool": pa.bool_(),
+    # strings
+    "varchar": pa.string(),
+    "text": pa.string(),
+    "string": pa.string(),
+    "char": pa.string(),
+    "uuid": pa.string(),
+    "bit": pa.string(),
+    # binary
+    "blob": pa.binary(),
+    "bytea": pa.binary(),
+    "varbinary": pa.binary(),
+    # temporal
+    "date": pa.date32(),
+    "time": pa.time64("us"),
+    "timestamp": pa.timestamp("us"),
+    "timestamptz": pa.timestamp("us", tz="UTC"),
+    "interval": pa.duration("us"),
+}
@@ -1,6 +1,8 @@
 import logging
 import os
 import sys
+import time
+import uuid
 from datetime import UTC, datetime
 from pathlib import Path
 
@@ -18,12 +20,47 @@ def setup_logging() -> None:
     )
 
 
-def _atomic_write_text(path: Path, text: str) -> None:
+def _atomic_write_bytes(path: Path, data: bytes, fsync: bool = True) -> None:
+    """
+    Write to a sibling temp file, then os.replace it over `path`.
+    The temp name is unique per call, so concurrent writers never share one.
+    """
     path.parent.mkdir(parents=True, exist_ok=True)
-    tmp = path.with_suffix(path.suffix + ".tmp")
-    tmp.write_text(text, encoding="utf-8")
-    os.replace(tmp, path)
+    tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    try:
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view) :]
+            if fsync:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    if fsync:
+        # Make the rename itself durable
+        dir_fd = os.open(path.parent, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+def _atomic_write_text(path: Path, text: str, fsync: bool = True) -> None:
+    _atomic_write_bytes(path, text.encode("utf-8"), fsync=fsync)
+
+
+# (epoch second, isoformat) of the last _curr_date() call
+_CURR_DATE_CACHE: tuple[int, str] = (-1, "")
 
 
 def _curr_date() -> str:
-    return datetime.now(UTC).replace(microsecond=0).isoformat()
+    global _CURR_DATE_CACHE
+    t = int(time.time())
+    if _CURR_DATE_CACHE[0] != t:
+        _CURR_DATE_CACHE = (t, datetime.fromtimestamp(t, UTC).isoformat())
+    return _CURR_DATE_CACHE[1]
@@ -1,4 +1,6 @@
 from dataclasses import asdict
+from datetime import UTC, datetime, timedelta
+from time import monotonic
 
 from fastapi import FastAPI, HTTPException, Request
 from mini_snowflake.orchestrator.orchestrator import route_external_query
@@ -35,7 +37,14 @@ def heartbeat(req: HeartbeatRequest, request: Request):
 @app.get("/workers")
 def list_workers():
     active = registry.list_active()
-    return {"active": [asdict(w) for w in active]}
+    # last_seen is tracked on the monotonic clock; report it as wall-clock time
+    now, now_mono = datetime.now(UTC), monotonic()
+    return {
+        "active": [
+            {**asdict(w), "last_seen": now - timedelta(seconds=now_mono - w.last_seen)}
+            for w in active
+        ]
+    }
 
 @app.post("/query", response_model=ExternalQueryResponse)
 def query(req: ExternalQueryRequest) -> ExternalQueryResponse:
@@ -1,34 +1,192 @@
 import logging
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from time import monotonic
 
+import orjson
 import requests
 from mini_snowflake.common.utils import setup_logging
 from pydantic import BaseModel
+from requests.adapters import HTTPAdapter
 
 from .models import ExternalQueryResponse, KindType
 
 setup_logging()
 logger = logging.getLogger("")
 
+# Keep-alive pool shared by every task submission: a plan level fans out many
+# concurrent posts to the same few workers
+_SESSION = requests.Session()
+_SESSION.mount("http://", HTTPAdapter(pool_connections=32, pool_maxsize=128))
+_SESSION.mount("https://", HTTPAdapter(pool_connections=32, pool_maxsize=128))
+_JSON_HEADERS = {"Content-Type": "application/json"}
+# Error prefix for tasks that could not connect to the worker: it is likely gone
+UNREACHABLE_ERROR = "Worker unreachable"
+# Error prefix for other transport failures, e.g. a read timeout on a busy worker
+REQUEST_ERROR = "Worker request failed"
+# Posts coalesced task batches so collecting the next batch never waits on the network
+_BATCH_POOL = ThreadPoolExecutor(max_workers=16, thread_name_prefix="batch-send")
+
+
+def dump_task(task: BaseModel) -> bytes:
+    # Serialized by pydantic-core straight to JSON, no intermediate dict
+    return task.model_dump_json().encode()
+
+
+def _request_error(e: requests.RequestException) -> str:
+    # ConnectTimeout is a ConnectionError too; a ReadTimeout is not
+    prefix = UNREACHABLE_ERROR if isinstance(e, requests.ConnectionError) else REQUEST_ERROR
+    return f"{prefix}: {e}"
+
 
 def send_task(
-    worker_base_url: str, task: BaseModel, kind: KindType, timeout_seconds: float = 15.0
+    worker_base_url: str,
+    task: BaseModel | bytes,
+    kind: KindType,
+    timeout_seconds: float = 15.0,
 ) -> ExternalQueryResponse:
     """
-    Orchestrator -> Worker client call.
+    Orchestrator -> Worker client call. `task` may be pre-serialized with `dump_task`
+    by callers that send the same task more than once.
     """
     url = worker_base_url.rstrip("/") + "/tasks/execute"
 
-    logger.info(f"Sending {kind} request: {task.model_dump()}")
-    r = requests.post(url, json=task.model_dump(), timeout=timeout_seconds)
-    logger.info(f"Recieved {r!s}")
+    logger.debug("Sending %s request: %s", kind, task)
+    try:
+        r = _SESSION.post(
+            url,
+            data=task if isinstance(task, bytes) else dump_task(task),
+            headers=_JSON_HEADERS,
+            timeout=timeout_seconds,
+        )
+    except requests.RequestException as e:
+        return ExternalQueryResponse(ok=False, error=_request_error(e), kind=kind)
+    logger.debug("Received %s", r)
 
     # Normalize errors
     if r.status_code >= 400:
         return ExternalQueryResponse(ok=False, error=r.text, kind=kind)
 
     try:
-        return ExternalQueryResponse(kind=kind, **r.json())
+        return ExternalQueryResponse(kind=kind, **orjson.loads(r.content))
     except Exception:
         return ExternalQueryResponse(
             ok=False, error=f"Invalid worker response: {r.text}", kind=kind
         )
+
+
+# Task awaiting a batch slot, with the future its response is delivered on
+_Pending = tuple[BaseModel, KindType, Future[ExternalQueryResponse]]
+
+
+class TaskBatcher:
+    """
+    Coalesces tasks bound for one worker: whatever arrives within `window_s` of the
+    first pending task (up to `max_batch`) goes out as a single /tasks/execute_batch.
+    """
+
+    def __init__(
+        self,
+        worker_base_url: str,
+        window_s: float = 0.005,
+        max_batch: int = 64,
+        timeout_seconds: float = 15.0,
+    ):
+        self.url = worker_base_url.rstrip("/") + "/tasks/execute_batch"
+        self.window_s = window_s
+        self.max_batch = max_batch
+        self.timeout_seconds = timeout_seconds
+        self._queue: queue.SimpleQueue[_Pending] = queue.SimpleQueue()
+        threading.Thread(target=self._collect, name="task-batcher", daemon=True).start()
+
+    def submit(self, task: BaseModel, kind: KindType) -> Future[ExternalQueryResponse]:
+        fut: Future[ExternalQueryResponse] = Future()
+        self._queue.put((task, kind, fut))
+        return fut
+
+    def _collect(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = monotonic() + self.window_s
+            while len(batch) < self.max_batch:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            _BATCH_POOL.submit(self._send, batch)
+
+    def _send(self, batch: list[_Pending]) -> None:
+        # Runs on _BATCH_POOL, whose futures nobody reads: every path must settle `batch`
+        try:
+            self._post(batch)
+        except Exception as e:
+            logger.exception("Batch send to %s failed", self.url)
+            _fail_batch(batch, f"{REQUEST_ERROR}: {e}")
+
+    def _post(self, batch: list[_Pending]) -> None:
+        logger.debug("Sending batch of %s tasks to %s", len(batch), self.url)
+        body = b"[" + b",".join(dump_task(task) for task, _, _ in batch) + b"]"
+        try:
+            r = _SESSION.post(
+                self.url,
+                data=body,
+                headers=_JSON_HEADERS,
+                # Each task keeps the per-task read budget it had when sent alone
+                timeout=(self.timeout_seconds, self.timeout_seconds * len(batch)),
+            )
+        except requests.RequestException as e:
+            return _fail_batch(batch, _request_error(e))
+
+        if r.status_code >= 400:
+            return _fail_batch(batch, r.text)
+
+        try:
+            responses = [
+                ExternalQueryResponse(kind=kind, **item)
+                for (_, kind, _), item in zip(batch, orjson.loads(r.content), strict=True)
+            ]
+        except Exception:
+            return _fail_batch(batch, f"Invalid worker response: {r.text}")
+        for (_, _, fut), resp in zip(batch, responses, strict=True):
+            fut.set_result(resp)
+
+    @property
+    def result_timeout(self) -> float:
+        """
+        Backstop for callers waiting on a future: a full batch's connect + read budget.
+        """
+        return self.window_s + self.timeout_seconds * (self.max_batch + 1)
+
+
+def _fail_batch(batch: list[_Pending], error: str) -> None:
+    for _, kind, fut in batch:
+        if not fut.done():
+            fut.set_result(ExternalQueryResponse(ok=False, error=error, kind=kind))
+
+
+_BATCHERS: dict[str, TaskBatcher] = {}
+_BATCHERS_LOCK = threading.Lock()
+
+
+def send_task_batched(
+    worker_base_url: str, task: BaseModel, kind: KindType
+) -> ExternalQueryResponse:
+    """
+    Like `send_task`, but rides along with other tasks sent to the same worker.
+    """
+    with _BATCHERS_LOCK:
+        batcher = _BATCHERS.get(worker_base_url)
+        if batcher is None:
+            batcher = _BATCHERS[worker_base_url] = TaskBatcher(worker_base_url)
+    try:
+        return batcher.submit(task, kind).result(timeout=batcher.result_timeout)
+    except TimeoutError:
+        return ExternalQueryResponse(
+            ok=False,
+            error=f"{REQUEST_ERROR}: no batch response within {batcher.result_timeout:.0f}s",
+            kind=kind,
+        )
@@ -1,15 +1,24 @@
+import asyncio
 import logging
 import math
+import os
+import queue
 import shutil
+import threading
+from collections.abc import Callable, Collection, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from time import monotonic, sleep
-from typing import Any
+from time import monotonic
+from typing import Any, Literal
+from uuid import uuid4
 
-from mini_snowflake.common.db_conn import DBConn
-from mini_snowflake.common.manifest import Manifest
+from mini_snowflake.common.db_conn import DBConn, get_db_conn
+from mini_snowflake.common.manifest import Manifest, ShardStats
 from mini_snowflake.common.utils import setup_logging
 from mini_snowflake.orchestrator.models import ExternalQueryResponse, KindType
 from mini_snowflake.orchestrator.query_maker import (
+    PlanCtx,
     create_final_reduce_job,
     create_intermediate_reduce_job,
     create_map_job,
@@ -18,6 +27,7 @@ from mini_snowflake.parser.models import (
     CreateQuery,
     DropQuery,
     InsertQuery,
+    PredicateTerm,
     SelectQuery,
 )
 from mini_snowflake.parser.parser import parse
@@ -27,34 +37,69 @@ from mini_snowflake.worker.models import (
     InsertRequest,
     SelectRequest,
 )
+from pydantic import BaseModel
 
-from .client import send_task
+from .client import UNREACHABLE_ERROR, dump_task, send_task, send_task_batched
 from .worker_registry import registry
 
 setup_logging()
 logger = logging.getLogger("")
 
+# Shared by every SELECT: job submissions mostly wait on worker HTTP responses
+_DISPATCH_POOL = ThreadPoolExecutor(max_workers=64, thread_name_prefix="dispatch")
 
-def orchestrate_create(query: CreateQuery, conn: DBConn) -> ExternalQueryResponse:
-    logger.info("Create request")
-    kind: KindType = "select"
-    workers = registry.list_active()
-    if not workers:
-        return ExternalQueryResponse(
-            ok=False,
-            kind=kind,
-            error="No active workers",
-        )
+# Retired scratch dirs, deleted off the query path by _janitor
+_GC_QUEUE: queue.SimpleQueue[Path] = queue.SimpleQueue()
 
-    chosen = workers[0]
-    task = CreateRequest(
-        db_path=str(conn.path),
-        table=query.table,
-        table_schema=query.schema,
-        if_not_exists=query.if_not_exists,
-    )
 
-    resp = send_task(chosen.base_url, task, "create")
+def _janitor() -> None:
+    while True:
+        shutil.rmtree(_GC_QUEUE.get(), ignore_errors=True)
+
+
+threading.Thread(target=_janitor, name="scratch-janitor", daemon=True).start()
+
+
+def _retire_scratch(tmp_path: Path, gc_root: Path) -> None:
+    """
+    O(1) rename out of the way; the O(N) unlinks happen on the janitor thread.
+    """
+    gc_root.mkdir(exist_ok=True)
+    retired = gc_root / tmp_path.name
+    os.rename(tmp_path, retired)
+    _GC_QUEUE.put(retired)
+
+
+def _table_key(db_path: str, table: str) -> str:
+    return f"{db_path}/{table}"
+
+
+def _dispatch(
+    task: BaseModel, kind: KindType, route_key: str | None = None
+) -> ExternalQueryResponse:
+    """
+    Runs a single-task statement on one worker. Tasks with a `route_key` always go
+    to the worker that key hashes to, so writers of one table never race across
+    worker processes; the rest go to the least loaded worker.
+    """
+    logger.info("%s request", kind.capitalize())
+    try:
+        chosen = registry.pick() if route_key is None else registry.route(route_key)
+    except RuntimeError as e:
+        return ExternalQueryResponse(ok=False, kind=kind, error=str(e))
+
+    # Count the task as in flight without waiting for the next heartbeat
+    registry.add_inflight(chosen, 1)
+    t0 = monotonic()
+    try:
+        resp = send_task_batched(chosen.base_url, task, kind)
+    finally:
+        registry.add_inflight(chosen, -1)
+        registry.observe_rtt(chosen, monotonic() - t0)
+    if not resp.ok and (resp.error or "").startswith(UNREACHABLE_ERROR):
+        # A worker that fails fast would otherwise look like the fastest one. Only
+        # connect failures evict: a read timeout just means the worker is busy.
+        registry.evict(chosen.worker_id)
 
     return ExternalQueryResponse(
         ok=resp.ok,
@@ -66,75 +111,61 @@ def orchestrate_create(query: CreateQuery, conn: DBConn) -> ExternalQueryRespons
     )
 
 
-def orchestrate_drop(query: DropQuery, conn: DBConn) -> ExternalQueryResponse:
-    logger.info("Drop request")
-    kind: KindType = "drop"
-    workers = registry.list_active()
-    if not workers:
-        return ExternalQueryResponse(
-            ok=False,
-            kind=kind,
-            error="No active workers",
-        )
-
-    chosen = workers[0]
-    task = DropRequest(
+def orchestrate_create(query: CreateQuery, conn: DBConn) -> ExternalQueryResponse:
+    task = CreateRequest(
         db_path=str(conn.path),
         table=query.table,
-        if_exists=query.if_exists,
+        table_schema=query.schema,
+        if_not_exists=query.if_not_exists,
     )
+    return _dispatch(task, "create", _table_key(task.db_path, task.table))
 
-    resp = send_task(chosen.base_url, task, "drop")
 
-    return ExternalQueryResponse(
-        ok=resp.ok,
-        kind=kind,
-        worker_id=chosen.worker_id,
-        worker_url=chosen.base_url,
-        result=resp.result,
-        error=resp.error,
+def orchestrate_drop(query: DropQuery, conn: DBConn) -> ExternalQueryResponse:
+    task = DropRequest(
+        db_path=str(conn.path),
+        table=query.table,
+        if_exists=query.if_exists,
     )
+    return _dispatch(task, "drop", _table_key(task.db_path, task.table))
 
 
 def orchestrate_insert(query: InsertQuery, conn: DBConn) -> ExternalQueryResponse:
-    logger.info("Insert request")
-    kind: KindType = "insert"
-    workers = registry.list_active()
-    if not workers:
-        return ExternalQueryResponse(
-            ok=False,
-            kind=kind,
-            error="No active workers",
-        )
-
-    chosen = workers[0]
     task = InsertRequest(
         db_path=str(conn.path),
         table=query.table,
         src_path=query.src_path,
         rows_per_shard=query.rows_per_shard,
     )
+    return _dispatch(task, "insert", _table_key(task.db_path, task.table))
 
-    resp = send_task(chosen.base_url, task, "create")
 
-    return ExternalQueryResponse(
-        ok=resp.ok,
-        kind=kind,
-        worker_id=chosen.worker_id,
-        worker_url=chosen.base_url,
-        result=resp.result,
-        error=resp.error,
-    )
+FanoutMode = Literal["latency", "cost"]
+
+
+@dataclass(frozen=True)
+class PlanJob:
+    sql: str
+    # Jobs of the previous level whose outputs this job reads
+    parents: range = range(0)
 
 
 def _get_fanout(
-    num_rows_per_shard: int,
-    R_target: int = 16_000_000,
+    num_inputs: int,
+    mode: FanoutMode = "cost",
+    scale: float = 1.0,
     k_min: int = 2,
     k_max: int = 256,
 ) -> int:
-    ratio = R_target / max(1, num_rows_per_shard)
-    k = 1 if ratio <= 1 else 1 << int(round(math.log2(ratio)))
+    """
+    Fan-in of the reduce tree. A balanced aggregation tree has the lowest latency
+    around fan-in e (~3), `scale` stretching it for nodes that can merge more inputs
+    at once; a one-shot reduction is cheapest as a single level over all inputs.
+    """
+    if mode == "latency":
+        k = round(math.e * scale)
+    else:
+        k = num_inputs
     return max(k_min, min(k, k_max))
 
 
@@ -144,14 +175,18 @@ def _planner(
     shards: list[str],
     out_path: str | Path,
     tmp_path: str | Path,
-) -> list[list[str]]:
-    fanout = _get_fanout(len(shards))
-    logger.info(f"Fanout = {fanout}")
+    fanout_mode: FanoutMode = "cost",
+) -> Iterator[list[PlanJob]]:
+    """
+    Yields the plan one level at a time (maps first, final reduce last), so the
+    caller can start dispatching a level while the ones above it are still built.
+    """
+    fanout = _get_fanout(len(shards), mode=fanout_mode)
+    logger.info("Fanout = %d", fanout)
     data_path = Path(conn.path)
+    ctx = PlanCtx.from_query(query)
 
-    plan_levels: list[list[str]] = []
-
-    map_sqls: list[str] = []
+    map_jobs: list[PlanJob] = []
     current_paths: list[Path] = []
 
     for s in shards:
@@ -161,15 +196,16 @@ def _planner(
             data_path=data_path,
             tmp_dir=tmp_path,
             fmt="parquet",
+            ctx=ctx,
         )
-        map_sqls.append(sql)
+        map_jobs.append(PlanJob(sql))
         current_paths.append(tmp_out_path)
 
-    plan_levels.append(map_sqls)
+    yield map_jobs
 
     level = 0
     while len(current_paths) > fanout:
-        next_sqls: list[str] = []
+        next_jobs: list[PlanJob] = []
         next_paths: list[Path] = []
 
         for i in range(0, len(current_paths), fanout):
@@ -180,11 +216,13 @@ def _planner(
                 tmp_dir=tmp_path,
                 tag=f"r{level}_{i//fanout}",
                 fmt="parquet",
+                inputs_level="map" if level == 0 else "interm",
+                ctx=ctx,
             )
-            next_sqls.append(sql)
+            next_jobs.append(PlanJob(sql, parents=range(i, i + len(chunk))))
             next_paths.append(tmp_out_path)
 
-        plan_levels.append(next_sqls)
+        yield next_jobs
 
         current_paths = next_paths
         level += 1
@@ -194,51 +232,198 @@ def _planner(
         inputs=current_paths,
         out_path=Path(out_path),
         fmt="parquet",
-        inputs_level="interm" if len(current_paths) > fanout else "map",
+        inputs_level="map" if level == 0 else "interm",
+        ctx=ctx,
     )
-    plan_levels.append([final_sql])
-    logger.info(f"plan_levels: {plan_levels}")
-
-    return plan_levels
+    yield [PlanJob(final_sql, parents=range(len(current_paths)))]
 
 
 def _get_first_worker_blocking(
     wait_start: float,
     wait_timeout_s: float | None,
+    delay: float = 0.02,
+    max_delay: float = 1.0,
+    factor: float = 1.8,
+    exclude: Collection[str] = (),
 ) -> Any:
     while True:
         workers = registry.list_active()
         if workers:
-            return registry.choose_worker()
+            return registry.choose_worker(exclude=exclude)
 
         logger.error("No active workers; waiting...")
-        sleep(0.5)
 
-        if wait_timeout_s is not None and (monotonic() - wait_start) > wait_timeout_s:
-            raise TimeoutError("No active workers became available before timeout")
+        # Registrations wake the wait immediately; the backoff only spaces out re-checks
+        wait_s = delay
+        if wait_timeout_s is not None:
+            remaining = wait_timeout_s - (monotonic() - wait_start)
+            if remaining <= 0:
+                raise TimeoutError("No active workers became available before timeout")
+            wait_s = min(wait_s, remaining)
 
+        registry.wait_for_active(wait_s)
+        delay = min(delay * factor, max_delay)
 
-def orchestrate_select(
-    query: SelectQuery,
+
+def _dispatch_select(
+    sql: str,
     conn: DBConn,
-    wait_timeout_s: float | None = 60.0,
-) -> ExternalQueryResponse:
-    logger.info("Select request")
-    kind: KindType = "select"
+    wait_start: float,
+    wait_timeout_s: float | None,
+    abandoned: threading.Event,
+    max_attempts: int = 3,
+    retry_delay: float = 0.05,
+    factor: float = 1.8,
+) -> tuple[Any, ExternalQueryResponse]:
+    """
+    Runs one job, retrying failures on a different worker with backoff so a
+    transient error does not throw away the levels already computed.
+    Stops retrying once `abandoned` is set (the query already gave up).
+    """
+    # Serialized once, however many attempts the job takes
+    task = dump_task(
+        SelectRequest(
+            db_path=str(conn.path),
+            raw_query=sql,
+        )
+    )
 
-    tmp_path = conn.path / "tmp"
-    tmp_path.mkdir(parents=True, exist_ok=True)
+    tried: set[str] = set()
+    attempt = 1
+    while True:
+        worker = _get_first_worker_blocking(
+            wait_start=wait_start,
+            wait_timeout_s=wait_timeout_s,
+            exclude=tried,
+        )
 
-    out_path = conn.path / "out.parquet"
+        resp = send_task(worker.base_url, task, "select")
+        if resp.ok or attempt >= max_attempts or abandoned.is_set():
+            return worker, resp
 
-    table_manifest = Manifest.load(conn.path / query.table / "manifest.json")
-    shards = list(table_manifest.shards)
-    if not shards:
-        return ExternalQueryResponse(
-            ok=False,
-            kind=kind,
-            error=f"No shards found for table {query.table}",
+        logger.warning(
+            "Job failed on %s (attempt %s/%s): %s",
+            worker.worker_id,
+            attempt,
+            max_attempts,
+            resp.error,
         )
+        tried.add(worker.worker_id)
+        if abandoned.wait(retry_delay):
+            return worker, resp
+        retry_delay *= factor
+        attempt += 1
+
+
+class _JobFailed(Exception):
+    def __init__(self, level: int, rec: dict[str, Any]):
+        super().__init__(rec.get("error"))
+        self.level = level
+        self.rec = rec
+
+
+async def _run_job(
+    job: PlanJob,
+    parents: list[asyncio.Task[None]],
+    level_i: int,
+    conn: DBConn,
+    executions: list[dict[str, Any]],
+    wait_start: float,
+    wait_timeout_s: float | None,
+    abandoned: threading.Event,
+) -> None:
+    # Only this job's own inputs gate it, not the whole previous level
+    await asyncio.gather(*parents)
+
+    loop = asyncio.get_running_loop()
+    worker, resp = await loop.run_in_executor(
+        _DISPATCH_POOL,
+        _dispatch_select,
+        job.sql,
+        conn,
+        wait_start,
+        wait_timeout_s,
+        abandoned,
+    )
+
+    rec = {
+        "job": len(executions),
+        "level": level_i,
+        "worker_id": getattr(worker, "worker_id", None),
+        "worker_url": getattr(worker, "base_url", None),
+        "ok": resp.ok,
+        "error": resp.error,
+        "result": resp.result,
+    }
+    executions.append(rec)
+    if not resp.ok:
+        raise _JobFailed(level_i, rec)
+    logger.debug("Completed job %s at level %s", rec["job"], level_i)
+
+
+async def _execute_plan(
+    plan_levels: Iterable[list[PlanJob]],
+    conn: DBConn,
+    executions: list[dict[str, Any]],
+    wait_timeout_s: float | None,
+) -> tuple[int, dict[str, Any]] | None:
+    """
+    Runs the plan as a DAG: every job is dispatched as soon as its parents are done,
+    so the query takes as long as its critical path rather than the sum of its
+    slowest job per level. Returns (level, failed_step) on the first failed job.
+    """
+    wait_start = monotonic()
+    # Tells jobs already running on the pool to stop retrying once we give up
+    abandoned = threading.Event()
+
+    tasks: list[asyncio.Task[None]] = []
+    prev: list[asyncio.Task[None]] = []
+    try:
+        for level_i, level_jobs in enumerate(plan_levels):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Plan level %s: %s", level_i, level_jobs)
+            prev = [
+                asyncio.create_task(
+                    _run_job(
+                        job,
+                        [prev[p] for p in job.parents],
+                        level_i,
+                        conn,
+                        executions,
+                        wait_start,
+                        wait_timeout_s,
+                        abandoned,
+                    )
+                )
+                for job in level_jobs
+            ]
+            tasks.extend(prev)
+            # Let this level's jobs reach the pool before planning the next one
+            await asyncio.sleep(0)
+
+        logger.info("Plan: %s levels, %s jobs", level_i + 1, len(tasks))
+        await asyncio.gather(*tasks)
+    except _JobFailed as e:
+        return e.level, e.rec
+    finally:
+        # Drop whatever has not started yet and collect the rest's outcomes
+        abandoned.set()
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    return None
+
+
+def _run_select(
+    query: SelectQuery,
+    conn: DBConn,
+    shards: list[str],
+    out_path: Path,
+    tmp_path: Path,
+    wait_timeout_s: float | None,
+) -> ExternalQueryResponse:
+    kind: KindType = "select"
 
     plan_levels = _planner(
         query=query,
@@ -248,52 +433,12 @@ def orchestrate_select(
         tmp_path=tmp_path,
     )
 
-    logger.info(f"Plan: {plan_levels}")
-
     executions: list[dict[str, Any]] = []
-    job_i = 0
-
-    wait_start = monotonic()
 
     try:
-        for level_i, level_sqls in enumerate(plan_levels):
-            for sql in level_sqls:
-                worker = _get_first_worker_blocking(
-                    wait_start=wait_start,
-                    wait_timeout_s=wait_timeout_s,
-                )
-
-                task = SelectRequest(
-                    db_path=str(conn.path),
-                    raw_query=sql,
-                )
-
-                resp = send_task(worker.base_url, task, "select")
-                rec = {
-                    "job": job_i,
-                    "level": level_i,
-                    "worker_id": getattr(worker, "worker_id", None),
-                    "worker_url": getattr(worker, "base_url", None),
-                    "ok": resp.ok,
-                    "error": resp.error,
-                    "result": resp.result,
-                }
-                executions.append(rec)
-                job_i += 1
-
-                if not resp.ok:
-                    # On failure, retry after refreshing workers.
-                    return ExternalQueryResponse(
-                        ok=False,
-                        kind=kind,
-                        error=f"""
-                            Execution failed at level {level_i}
-                            Failed_step: {rec}
-                            Executions: {executions}""",
-                    )
-
-            logger.info("Completed level %s (%s statements)", level_i, len(level_sqls))
-
+        failure = asyncio.run(
+            _execute_plan(plan_levels, conn, executions, wait_timeout_s)
+        )
     except TimeoutError as e:
         return ExternalQueryResponse(
             ok=False,
@@ -301,40 +446,128 @@ def orchestrate_select(
             error=f"{e!s}\nExecutions: {executions}",
         )
 
-    shutil.rmtree(tmp_path)
+    if failure is not None:
+        level_i, rec = failure
+        return ExternalQueryResponse(
+            ok=False,
+            kind=kind,
+            error=f"""
+                Execution failed at level {level_i}
+                Failed_step: {rec}
+                Executions: {executions}""",
+        )
 
     return ExternalQueryResponse(
-        ok=resp.ok,
+        ok=True,
         kind=kind,
         result=f"Successfully executed select, result in {out_path}",
     )
 
 
+# (min, max, literal) -> whether some value in [min, max] can satisfy the comparison
+_BOUND_CHECKS: dict[str, Callable[[Any, Any, Any], bool]] = {
+    "=": lambda lo, hi, v: lo <= v <= hi,
+    "!=": lambda lo, hi, v: not lo == hi == v,
+    "<": lambda lo, hi, v: lo < v,
+    "<=": lambda lo, hi, v: lo <= v,
+    ">": lambda lo, hi, v: hi > v,
+    ">=": lambda lo, hi, v: hi >= v,
+}
+
+
+def _term_may_match(stats: ShardStats, term: PredicateTerm) -> bool:
+    """
+    False only when the shard's stats prove no row can satisfy `term`.
+    """
+    nulls = stats.null_counts.get(term.col)
+    if term.op == "is_null":
+        return nulls is None or nulls > 0
+    if nulls == stats.rows:
+        # IS NOT NULL and every comparison are false on an all-null column
+        return False
+    if term.op == "is_not_null":
+        return True
+
+    lo, hi, v = stats.mins.get(term.col), stats.maxs.get(term.col), term.value
+    if isinstance(v, str) and len(v) >= 2 and v[0] == v[-1] == "'":
+        v = v[1:-1]
+    # Only prune when Python and DuckDB order the two sides the same way
+    if lo is None or hi is None or v is None or isinstance(v, bool):
+        return True
+    if isinstance(v, str) != isinstance(lo, str):
+        return True
+
+    check = _BOUND_CHECKS.get(term.op)
+    return check is None or check(lo, hi, v)
+
+
+def _prune_shards(manifest: Manifest, where: list[PredicateTerm] | None) -> list[str]:
+    """
+    Drops shards whose min/max and null counts rule out the AND-ed WHERE terms.
+    One shard is always kept so the plan still yields a correctly shaped result.
+    """
+    shards = list(manifest.shards)
+    if not where or not manifest.shard_stats:
+        return shards
+    kept = [
+        s
+        for s in shards
+        if (stats := manifest.shard_stats.get(s)) is None
+        or all(_term_may_match(stats, term) for term in where)
+    ]
+    logger.info("Pruned %d/%d shards by stats", len(shards) - len(kept), len(shards))
+    return kept or shards[:1]
+
+
+def orchestrate_select(
+    query: SelectQuery,
+    conn: DBConn,
+    wait_timeout_s: float | None = 60.0,
+) -> ExternalQueryResponse:
+    logger.info("Select request")
+    kind: KindType = "select"
+
+    out_path = conn.path / "out.parquet"
+
+    table_manifest = conn.manifest(query.table)
+    shards = _prune_shards(table_manifest, query.where)
+    if not shards:
+        return ExternalQueryResponse(
+            ok=False,
+            kind=kind,
+            error=f"No shards found for table {query.table}",
+        )
+
+    # Private scratch dir per query under the persistent tmp root
+    tmp_path = conn.path / "tmp" / uuid4().hex
+    tmp_path.mkdir(parents=True)
+
+    try:
+        return _run_select(query, conn, shards, out_path, tmp_path, wait_timeout_s)
+    finally:
+        _retire_scratch(tmp_path, conn.path / "tmp_gc")
+
+
+_ROUTES: dict[type, Callable[[Any, DBConn], ExternalQueryResponse]] = {
+    CreateQuery: orchestrate_create,
+    DropQuery: orchestrate_drop,
+    InsertQuery: orchestrate_insert,
+    SelectQuery: orchestrate_select,
+}
+
+
 def route_external_query(path: str, raw_query: str) -> ExternalQueryResponse:
     """
     External routing: parse and dispatch.
-    For now: only CreateQuery is wired.
     """
-    conn = DBConn(path)
+    conn = get_db_conn(path)
     query = parse(raw_query)
-    out = None
-    kind: KindType = "unknown"
-
-    if isinstance(query, CreateQuery):
-        out = orchestrate_create(query, conn)
-    if isinstance(query, DropQuery):
-        out = orchestrate_drop(query, conn)
-    if isinstance(query, InsertQuery):
-        out = orchestrate_insert(query, conn)
-    if isinstance(query, SelectQuery):
-        out = orchestrate_select(query, conn)
-
-    if out is not None:
-        return out
-
-    # Not implemented yet
-    return ExternalQueryResponse(
-        ok=False,
-        kind=kind,
-        error=f"Unsupported query type: {type(query).__name__}",
-    )
+
+    handler = _ROUTES.get(type(query))
+    if handler is None:
+        return ExternalQueryResponse(
+            ok=False,
+            kind="unknown",
+            error=f"Unsupported query type: {type(query).__name__}",
+        )
+    return handler(query, conn)
@@ -1,7 +1,10 @@
 from __future__ import annotations
 
 import logging
+import sys
 from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
 from typing import Literal
 
@@ -13,12 +16,15 @@ logger = logging.getLogger("")
 
 InputsLevelLiteral = Literal["interm", "map"]
 
+_SAFE_IDENT_TABLE = str.maketrans({".": "_", "-": "_"})
 
+
+@lru_cache(maxsize=4096)
 def _safe_ident(x: str | None) -> str:
     if x is None:
         return ""
     else:
-        return x.replace("*", "star").replace(".", "_").replace("-", "_")
+        return x.replace("*", "star").translate(_SAFE_IDENT_TABLE)
 
 
 def _unparse_where_clause(clause: PredicateTerm) -> str:
@@ -53,17 +59,19 @@ def _iter_aggs(q: SelectQuery) -> Iterable[AggExpr]:
             yield s
 
 
-def _has_sum_for_col(q: SelectQuery, col: str | None) -> AggExpr | None:
-    if col is None:
-        col = ""
-    for a in _iter_aggs(q):
-        if a.func.lower() == "sum" and a.col == col:
-            return a
-    return None
+def _sql_union_all_select_star(sources: Sequence[str | Path]) -> str:
+    return " UNION ALL ".join(["SELECT * FROM " + _sql_source(src) for src in sources])
 
 
-def _sql_union_all_select_star(sources: Sequence[str | Path]) -> str:
-    return " UNION ALL ".join(f"SELECT * FROM { _sql_source(src) }" for src in sources)
+def _sql_scan(sources: Sequence[str | Path]) -> str:
+    """
+    One scan over all sources: a single read_parquet() over the file list when every
+    source is parquet, UNION ALL of per-source SELECTs otherwise.
+    """
+    if sources and all(str(src).endswith(".parquet") for src in sources):
+        files = ", ".join([_sql_source(src) for src in sources])
+        return f"SELECT * FROM read_parquet([{files}], union_by_name=true)"
+    return _sql_union_all_select_star(sources)
 
 
 def _sql_source(src: str | Path) -> str:
@@ -74,40 +82,78 @@ def _sql_source(src: str | Path) -> str:
     return str(src)
 
 
-def _materialize(select_sql: str, out_path: str | Path, fmt: str = "parquet") -> str:
+_COPY_TPL = "COPY ({sel}) TO '{path}' (FORMAT {fmt});"
+_COPY_PARQUET_TPL = (
+    "COPY ({sel}) TO '{path}' (FORMAT PARQUET, ROW_GROUP_SIZE {row_group_size}, "
+    "ROW_GROUP_SIZE_BYTES {row_group_size_bytes}, COMPRESSION {compression});"
+)
+
+
+@dataclass(frozen=True)
+class CopyOptions:
+    """
+    Parquet writer limits for job outputs. Capping row groups bounds how much a
+    worker buffers per file instead of DuckDB's unbounded defaults.
+    ROW_GROUP_SIZE_BYTES needs preserve_insertion_order disabled on the worker.
+    """
+
+    row_group_size: int = 100_000
+    row_group_size_bytes: int = 128 * 1024 * 1024
+    compression: str = "zstd"
+
+
+DEFAULT_COPY_OPTIONS = CopyOptions()
+
+
+@lru_cache(maxsize=8)
+def _format_keyword(fmt: str) -> str:
+    return sys.intern(fmt.upper())
+
+
+def _materialize(
+    select_sql: str,
+    out_path: str | Path,
+    fmt: str = "parquet",
+    copy_options: CopyOptions = DEFAULT_COPY_OPTIONS,
+) -> str:
     """
     Materialize a SELECT into a file.
     """
-    query = f"COPY ({select_sql}) TO '{out_path}' (FORMAT {fmt.upper()});"
-    return " ".join(query.split())
+    fmt_keyword = _format_keyword(fmt)
+    if fmt_keyword != "PARQUET":
+        return _COPY_TPL.format_map({"sel": select_sql, "path": out_path, "fmt": fmt_keyword})
+    return _COPY_PARQUET_TPL.format_map(
+        {
+            "sel": select_sql,
+            "path": out_path,
+            "row_group_size": copy_options.row_group_size,
+            "row_group_size_bytes": copy_options.row_group_size_bytes,
+            "compression": _format_keyword(copy_options.compression),
+        }
+    )
+
 
+_ALIAS_PREFIX = {"count": "c_", "sum": "s_", "min": "min_", "max": "max_"}
+_MERGE = {"count": "sum", "sum": "sum", "min": "min", "max": "max"}
 
+
+@lru_cache(maxsize=4096)
 def _map_alias(func: str, col: str | None) -> str:
-    if col is None:
-        col = ""
-    func = func.lower()
-    col_id = _safe_ident(col)
-    if func == "count":
-        return f"c_{col_id}"
-    if func == "sum":
-        return f"s_{col_id}"
-    if func == "min":
-        return f"min_{col_id}"
-    if func == "max":
-        return f"max_{col_id}"
-    raise ValueError(f"Unsupported aggregate func: {func!r}")
+    try:
+        prefix = _ALIAS_PREFIX[func.lower()]
+    except KeyError:
+        raise ValueError(f"Unsupported aggregate func: {func.lower()!r}") from None
+    return prefix + _safe_ident("" if col is None else col)
 
 
 def _merge_func(func: str) -> str:
-    func = func.lower()
-    if func in {"count", "sum"}:
-        return "sum"
-    if func in {"min", "max"}:
-        return func
-    raise ValueError(f"Unsupported aggregate func: {func!r}")
+    try:
+        return _MERGE[func.lower()]
+    except KeyError:
+        raise ValueError(f"Unsupported aggregate func: {func.lower()!r}") from None
 
 
-def _required_map_measures(q: SelectQuery) -> list[tuple[str, str]]:
+def _required_map_measures(agg_funcs: Iterable[tuple[AggExpr, str]]) -> list[tuple[str, str]]:
     """
     Deduped list of (func, col) needed in MAP.
     avg(x) expands into sum(x) + count(x).
@@ -115,8 +161,7 @@ def _required_map_measures(q: SelectQuery) -> list[tuple[str, str]]:
     seen: set[tuple[str, str]] = set()
     out: list[tuple[str, str]] = []
 
-    for agg in _iter_aggs(q):
-        f = agg.func.lower()
+    for agg, f in agg_funcs:
         if f == "avg":
             for mf in ("sum", "count"):
                 key = (mf, agg.col if agg.col is not None else "")
@@ -132,44 +177,74 @@ def _required_map_measures(q: SelectQuery) -> list[tuple[str, str]]:
     return out
 
 
-def _has_avg_for_col(q: SelectQuery, col: str) -> AggExpr | None:
-    for a in _iter_aggs(q):
-        if a.func.lower() == "avg" and a.col == col:
-            return a
-    return None
+@dataclass(frozen=True)
+class PlanCtx:
+    """
+    Per-query facts shared by every job of a plan, derived once instead of per shard
+    and per reduce node.
+    """
 
+    group: list[str]
+    # Aggregates in select order, each with its lowercased func
+    agg_funcs: list[tuple[AggExpr, str]]
+    required_measures: list[tuple[str, str]]
+    has_agg: bool
+    # First aggregate per (func, col), func lowercased
+    aggs_by_key: dict[tuple[str, str | None], AggExpr]
+
+    @classmethod
+    def from_query(cls, q: SelectQuery) -> PlanCtx:
+        agg_funcs = [(a, a.func.lower()) for a in _iter_aggs(q)]
+        if agg_funcs:
+            for item in q.select:
+                if not isinstance(item, (ColumnRef, AggExpr)):
+                    raise TypeError(f"Unsupported select item: {item!r}")
+
+        aggs_by_key: dict[tuple[str, str | None], AggExpr] = {}
+        for a, f in agg_funcs:
+            aggs_by_key.setdefault((f, a.col), a)
+        return cls(
+            group=_group_cols(q),
+            agg_funcs=agg_funcs,
+            required_measures=_required_map_measures(agg_funcs),
+            has_agg=bool(agg_funcs),
+            aggs_by_key=aggs_by_key,
+        )
 
-def create_map_select(q: SelectQuery, shard_name: str, path: str | Path) -> str:
-    group = _group_cols(q)
-    select_parts: list[str] = []
+    def agg_for(self, func: str, col: str | None) -> AggExpr | None:
+        """
+        O(1) replacement for scanning the aggregates for a (func, col) match.
+        """
+        return self.aggs_by_key.get((func, "" if col is None else col))
 
-    for s in q.select:
-        if isinstance(s, ColumnRef):
-            if s.name not in select_parts:
-                select_parts.append(s.name)
 
-    for c in group:
-        if c not in select_parts:
-            select_parts.append(c)
+def create_map_select(
+    q: SelectQuery,
+    shard_name: str,
+    path: str | Path,
+    *,
+    ctx: PlanCtx | None = None,
+) -> str:
+    ctx = ctx if ctx is not None else PlanCtx.from_query(q)
+    group = ctx.group
+
+    # Insertion-ordered dedup of plain columns and group keys
+    select_parts = dict.fromkeys(s.name for s in q.select if isinstance(s, ColumnRef))
+    select_parts.update(dict.fromkeys(group))
 
-    for func, col in _required_map_measures(q):
-        select_parts.append(f"{func}({col}) AS {_map_alias(func, col)}")
+    for func, col in ctx.required_measures:
+        select_parts[f"{func}({col}) AS {_map_alias(func, col)}"] = None
 
     if not select_parts:
-        select_parts.append("*")
+        select_parts["*"] = None
 
-    sql = f"""
-        SELECT
-            {", ".join(select_parts)}
-        FROM
-            '{Path(path) / q.table / shard_name}'
-    """.strip()
+    sql = f"SELECT {', '.join(select_parts)} FROM '{Path(path) / q.table / shard_name}'"
 
     if q.where:
-        sql += "\nWHERE " + " AND ".join(_unparse_where_clause(w) for w in q.where)
+        sql += " WHERE " + " AND ".join(_unparse_where_clause(w) for w in q.where)
 
     if group:
-        sql += "\nGROUP BY " + ", ".join(group)
+        sql += " GROUP BY " + ", ".join(group)
 
     return sql
 
@@ -180,64 +255,58 @@ def create_map_job(
     data_path: str | Path,
     tmp_dir: str | Path,
     fmt: str = "parquet",
+    *,
+    ctx: PlanCtx | None = None,
+    copy_options: CopyOptions = DEFAULT_COPY_OPTIONS,
 ) -> tuple[str, Path]:
     """
     Returns (sql_to_execute, output_path).
     """
 
     out_path = Path(tmp_dir) / f"map__{q.table}__{_safe_ident(shard_name)}.{fmt}"
-    select_sql = create_map_select(q, shard_name, data_path)
-    return _materialize(select_sql, out_path, fmt=fmt), out_path
+    select_sql = create_map_select(q, shard_name, data_path, ctx=ctx)
+    return _materialize(select_sql, out_path, fmt=fmt, copy_options=copy_options), out_path
 
 
 def create_intermediate_reduce_select(
-    q: SelectQuery, map_outputs: Sequence[str | Path]
+    q: SelectQuery,
+    map_outputs: Sequence[str | Path],
+    *,
+    inputs_level: InputsLevelLiteral = "map",
+    ctx: PlanCtx | None = None,
 ) -> str:
-    group = _group_cols(q)
+    ctx = ctx if ctx is not None else PlanCtx.from_query(q)
+    group = ctx.group
 
-    union_sql = _sql_union_all_select_star(map_outputs)
+    source_sql = _sql_scan(map_outputs)
 
-    if not any(isinstance(s, AggExpr) for s in q.select):
+    if not ctx.has_agg:
         if group:
-            return f"""
-                WITH partial AS (
-                    {union_sql}
-                )
-                SELECT
-                    {", ".join(group)}
-                FROM partial
-                GROUP BY {", ".join(group)}
-            """.strip()
-        return f"""
-            WITH partial AS (
-                {union_sql}
+            group_sql = ", ".join(group)
+            return (
+                f"WITH partial AS ( {source_sql} ) "
+                f"SELECT {group_sql} FROM partial GROUP BY {group_sql}"
             )
-            SELECT * FROM partial
-        """.strip()
+        return f"WITH partial AS ( {source_sql} ) SELECT * FROM partial"
 
     reduce_select: list[str] = []
     for c in group:
         reduce_select.append(c)
 
-    for item in q.select:
-        if isinstance(item, ColumnRef):
-            continue
-        if not isinstance(item, AggExpr):
-            raise TypeError(f"Unsupported select item: {item!r}")
-
-        func = item.func.lower()
-
+    for item, func in ctx.agg_funcs:
+        # Partials merged from an earlier reduce keep their own column names
         if func == "avg":
             avg_alias = item.alias or f"avg_{_safe_ident(item.col)}"
-            cnt_map = _map_alias("count", item.col)
-            reduce_select.append(f"sum({cnt_map}) AS {avg_alias}_count_partial")
-
-            if _has_sum_for_col(q, item.col) is None:
-                sum_map = _map_alias("sum", item.col)
-                reduce_select.append(f"sum({sum_map}) AS {avg_alias}_sum_partial")
+            cnt_out = f"{avg_alias}_count_partial"
+            cnt_in = _map_alias("count", item.col) if inputs_level == "map" else cnt_out
+            reduce_select.append(f"sum({cnt_in}) AS {cnt_out}")
+
+            if ctx.agg_for("sum", item.col) is None:
+                sum_out = f"{avg_alias}_sum_partial"
+                sum_in = _map_alias("sum", item.col) if inputs_level == "map" else sum_out
+                reduce_select.append(f"sum({sum_in}) AS {sum_out}")
             continue
 
-        map_col = _map_alias(func, item.col)
         merge = _merge_func(func)
 
         if func == "count" and item.col == "*":
@@ -247,19 +316,13 @@ def create_intermediate_reduce_select(
         else:
             out_alias = f"{func}_{_safe_ident(item.col)}_partial"
 
-        reduce_select.append(f"{merge}({map_col}) AS {out_alias}")
+        in_col = _map_alias(func, item.col) if inputs_level == "map" else out_alias
+        reduce_select.append(f"{merge}({in_col}) AS {out_alias}")
 
-    sql = f"""
-        WITH partial AS (
-            {union_sql}
-        )
-        SELECT
-            {", ".join(reduce_select)}
-        FROM partial
-    """.strip()
+    sql = f"WITH partial AS ( {source_sql} ) SELECT {', '.join(reduce_select)} FROM partial"
 
     if group:
-        sql += "\nGROUP BY " + ", ".join(group)
+        sql += " GROUP BY " + ", ".join(group)
 
     return sql
 
@@ -270,14 +333,20 @@ def create_intermediate_reduce_job(
     tmp_dir: str | Path,
     tag: str,
     fmt: str = "parquet",
+    *,
+    inputs_level: InputsLevelLiteral = "map",
+    ctx: PlanCtx | None = None,
+    copy_options: CopyOptions = DEFAULT_COPY_OPTIONS,
 ) -> tuple[str, Path]:
     """
     Returns (sql_to_execute, output_path).
     """
     tmp_dir = Path(tmp_dir)
     out_path = tmp_dir / f"reduce__{q.table}__{_safe_ident(tag)}.{fmt}"
-    select_sql = create_intermediate_reduce_select(q, map_outputs)
-    return _materialize(select_sql, out_path, fmt=fmt), out_path
+    select_sql = create_intermediate_reduce_select(
+        q, map_outputs, inputs_level=inputs_level, ctx=ctx
+    )
+    return _materialize(select_sql, out_path, fmt=fmt, copy_options=copy_options), out_path
 
 
 def create_final_reduce_select(
@@ -285,40 +354,26 @@ def create_final_reduce_select(
     inputs: Sequence[str | Path],
     *,
     inputs_level: InputsLevelLiteral = "interm",
+    ctx: PlanCtx | None = None,
 ) -> str:
-    group = _group_cols(q)
-    union_sql = _sql_union_all_select_star(inputs)
+    ctx = ctx if ctx is not None else PlanCtx.from_query(q)
+    group = ctx.group
+    source_sql = _sql_scan(inputs)
 
-    if not any(isinstance(s, AggExpr) for s in q.select):
+    if not ctx.has_agg:
         if group:
-            return f"""
-                WITH partial AS (
-                    {union_sql}
-                )
-                SELECT
-                    {", ".join(group)}
-                FROM partial
-                GROUP BY {", ".join(group)}
-            """.strip()
-        return f"""
-            WITH partial AS (
-                {union_sql}
+            group_sql = ", ".join(group)
+            return (
+                f"WITH partial AS ( {source_sql} ) "
+                f"SELECT {group_sql} FROM partial GROUP BY {group_sql}"
             )
-            SELECT * FROM partial
-        """.strip()
+        return f"WITH partial AS ( {source_sql} ) SELECT * FROM partial"
 
     final_select: list[str] = []
     for c in group:
         final_select.append(c)
 
-    for item in q.select:
-        if isinstance(item, ColumnRef):
-            continue
-        if not isinstance(item, AggExpr):
-            raise TypeError(f"Unsupported select item: {item!r}")
-
-        func = item.func.lower()
-
+    for item, func in ctx.agg_funcs:
         if inputs_level == "map":
             if func == "avg":
                 avg_alias = item.alias or f"avg_{_safe_ident(item.col)}"
@@ -361,7 +416,7 @@ def create_final_reduce_select(
         if func == "avg":
             avg_alias = item.alias or f"avg_{_safe_ident(item.col)}"
 
-            sum_agg = _has_sum_for_col(q, item.col)
+            sum_agg = ctx.agg_for("sum", item.col)
             if sum_agg is not None:
                 sum_partial_col = (
                     f"{(sum_agg.alias or f'sum_{_safe_ident(sum_agg.col)}')}_partial"
@@ -390,17 +445,10 @@ def create_final_reduce_select(
         merge = _merge_func(func)
         final_select.append(f"{merge}({in_col}) AS {out_col}")
 
-    sql = f"""
-        WITH partial AS (
-            {union_sql}
-        )
-        SELECT
-            {", ".join(final_select)}
-        FROM partial
-    """.strip()
+    sql = f"WITH partial AS ( {source_sql} ) SELECT {', '.join(final_select)} FROM partial"
 
     if group:
-        sql += "\nGROUP BY " + ", ".join(group)
+        sql += " GROUP BY " + ", ".join(group)
 
     return sql
 
@@ -412,73 +460,12 @@ def create_final_reduce_job(
     fmt: str = "parquet",
     *,
     inputs_level: InputsLevelLiteral = "interm",
+    ctx: PlanCtx | None = None,
+    copy_options: CopyOptions = DEFAULT_COPY_OPTIONS,
 ) -> tuple[str, Path]:
     """
     Returns (sql_to_execute, output_path).
     """
-    select_sql = create_final_reduce_select(q, inputs, inputs_level=inputs_level)
-    return _materialize(select_sql, out_path, fmt=fmt), Path(out_path)
-
-
-if __name__ == "__main__":
-    query = SelectQuery(
-        table="events",
-        select=[
-            ColumnRef(name="country"),
-            # AggExpr(func="count", col="*"),
-            # AggExpr(func="count", col="user_id", alias="n_user_id_nonnull"),
-            # AggExpr(func="sum", col="value", alias="total_value"),
-            # AggExpr(func="avg", col="value", alias="avg_value"),
-            # AggExpr(func="min", col="event_time", alias="first_seen"),
-            # AggExpr(func="max", col="event_time", alias="last_seen"),
-        ],
-        where=[
-            PredicateTerm(
-                col="event_time",
-                op=">=",
-                value="2025-01-01T00:00:00Z",
-            ),
-            PredicateTerm(
-                col="event_time",
-                op="<",
-                value="2025-02-01T00:00:00Z",
-            ),
-            PredicateTerm(
-                col="value",
-                op=">=",
-                value=0,
-            ),
-            PredicateTerm(
-                col="user_id",
-                op="is_not_null",
-                value=None,
-            ),
-        ],
-        group_by=None,  # ["event_type"],
-    )
-
-    shards = ["shard-0", "shard-1", "shard-2"]
-    data_path = "src/data"
-    tmp_dir = f"{data_path}/tmp"
-
-    map_jobs: list[tuple[str, Path]] = []
-    for s in shards:
-        sql, out = create_map_job(query, s, data_path, tmp_dir, fmt="parquet")
-        map_jobs.append((sql, out))
-
-    print("\n--- MAP ---\n")
-    for sql, out in map_jobs:
-        print(f"- {out}\n{sql}\n")
+    select_sql = create_final_reduce_select(q, inputs, inputs_level=inputs_level, ctx=ctx)
+    return _materialize(select_sql, out_path, fmt=fmt, copy_options=copy_options), Path(out_path)
 
-    map_outputs = [out for _, out in map_jobs]
-
-    interm_sql, interm_out = create_intermediate_reduce_job(
-        query, map_outputs, tmp_dir, tag="r0", fmt="parquet"
-    )
-    print("\n--- INTERMEDIATE REDUCE ---\n")
-    print(f"- {interm_out}\n{interm_sql}\n")
-    final_sql, final_out = create_final_reduce_job(
-        query, [interm_out], out_path="src/data/out/final_events.parquet", fmt="parquet"
-    )
-    print("\n--- FINAL REDUCE ---\n")
-    print(f"- {final_out}\n{final_sql}\n")
@@ -1,54 +1,171 @@
+import hashlib
+import heapq
+import random
+from collections.abc import Collection
 from dataclasses import dataclass
-from datetime import UTC, datetime, timedelta
 import threading
 from itertools import count
+from time import monotonic
+from typing import Literal
 
+PickStrategy = Literal["p2c", "least"]
 
-@dataclass
+
+@dataclass(slots=True)
 class WorkerInfo:
     worker_id: str
     base_url: str
-    last_seen: datetime
+    # time.monotonic() of the latest register/heartbeat
+    last_seen: float
+    # Worker-reported load, overwritten by every heartbeat
     load: float = 0.0
+    # Tasks this orchestrator has sent and not yet seen answered; heartbeats never touch it
+    inflight: int = 0
+    # Smoothed round-trip time of tasks sent from this orchestrator, in seconds
+    rtt_ewma: float = 0.0
 
 
 class WorkerRegistry:
     def __init__(self, ttl_seconds: int = 45):
-        self.ttl = timedelta(seconds=ttl_seconds)
+        self.ttl = float(ttl_seconds)
         self.workers: dict[str, WorkerInfo] = {}
         self._lock = threading.Lock()
+        # Notified on register/heartbeat so waiters wake as soon as a worker shows up
+        self._changed = threading.Condition(self._lock)
         self._rr = count(0)
+        # (last_seen, worker_id) per register/heartbeat; the oldest expire first
+        self._by_seen: list[tuple[float, str]] = []
 
     def upsert(self, worker_id: str, base_url: str, load: float) -> None:
-        self.workers[worker_id] = WorkerInfo(
-            worker_id=worker_id,
-            base_url=base_url.rstrip("/"),
-            last_seen=datetime.now(UTC),
-            load=float(load),
-        )
+        with self._changed:
+            now = monotonic()
+            w = self.workers.get(worker_id)
+            if w is None:
+                self.workers[worker_id] = WorkerInfo(
+                    worker_id=worker_id,
+                    base_url=base_url.rstrip("/"),
+                    last_seen=now,
+                    load=float(load),
+                )
+            else:
+                # Updated in place: tasks in flight still hold this object, and their
+                # inflight/RTT bookkeeping must land on the live entry
+                w.base_url = base_url.rstrip("/")
+                w.last_seen = now
+                w.load = float(load)
+            heapq.heappush(self._by_seen, (now, worker_id))
+            self._changed.notify_all()
 
     def heartbeat(
         self, worker_id: str, base_url: str | None, load: float | None
     ) -> None:
-        if worker_id not in self.workers:
-            raise KeyError(worker_id)
-        w = self.workers[worker_id]
-        w.last_seen = datetime.now(UTC)
-        if base_url:
-            w.base_url = base_url.rstrip("/")
-        if load is not None:
-            w.load = float(load)
+        with self._changed:
+            if worker_id not in self.workers:
+                raise KeyError(worker_id)
+            w = self.workers[worker_id]
+            w.last_seen = monotonic()
+            heapq.heappush(self._by_seen, (w.last_seen, worker_id))
+            if base_url:
+                w.base_url = base_url.rstrip("/")
+            if load is not None:
+                w.load = float(load)
+            self._changed.notify_all()
+
+    def _live(self) -> list[WorkerInfo]:
+        """
+        Drops workers whose latest heartbeat is past the TTL; caller holds the lock.
+        Heap entries superseded by a newer heartbeat are discarded on the way.
+        """
+        cutoff = monotonic() - self.ttl
+        heap = self._by_seen
+        while heap and heap[0][0] < cutoff:
+            seen, worker_id = heapq.heappop(heap)
+            w = self.workers.get(worker_id)
+            if w is not None and w.last_seen == seen:
+                del self.workers[worker_id]
+        return list(self.workers.values())
+
+    def evict(self, worker_id: str) -> None:
+        """
+        Forgets a worker until it registers again, which its next heartbeat triggers.
+        """
+        with self._lock:
+            self.workers.pop(worker_id, None)
 
     def list_active(self) -> list[WorkerInfo]:
-        now = datetime.now(UTC)
-        return [w for w in self.workers.values() if (now - w.last_seen) <= self.ttl]
-
-    def choose_worker(self) -> WorkerInfo:
-        active = self.list_active()
-        if not active:
-            raise RuntimeError("No active workers")
-        i = next(self._rr)
-        return active[i % len(active)]
+        with self._lock:
+            return self._live()
+
+    def wait_for_active(self, timeout: float | None) -> list[WorkerInfo]:
+        """
+        Blocks until some worker is active or `timeout` elapses, without polling.
+        """
+        with self._changed:
+            self._changed.wait_for(self._live, timeout)
+            return self._live()
+
+    def choose_worker(self, exclude: Collection[str] = ()) -> WorkerInfo:
+        with self._lock:
+            active = self._live()
+            if not active:
+                raise RuntimeError("No active workers")
+            # Prefer workers outside `exclude`, but never refuse while any worker is up
+            candidates = [w for w in active if w.worker_id not in exclude] or active
+            i = next(self._rr)
+            return candidates[i % len(candidates)]
+
+    def pick(self, strategy: PickStrategy = "p2c") -> WorkerInfo:
+        """
+        Greedy by predicted cost, (load + inflight + 1) * (1 + rtt_ewma): "least"
+        takes the best worker, "p2c" the better of two random ones, which avoids every
+        caller herding onto the same minimum. Queue depth dominates and RTT breaks
+        ties, so a worker without an RTT sample yet still pays for its queue.
+        """
+        # Compared under the lock so a concurrent heartbeat can't tear the inputs
+        with self._lock:
+            active = self._live()
+            if not active:
+                raise RuntimeError("No active workers")
+            if strategy == "least" or len(active) < 2:
+                return min(active, key=_predicted_cost)
+            a, b = random.sample(active, 2)
+            return a if _predicted_cost(a) <= _predicted_cost(b) else b
+
+    def route(self, key: str) -> WorkerInfo:
+        """
+        Rendezvous hash of `key` over the live workers: every orchestrator sends the
+        same key to the same worker, and only keys owned by a departed worker move.
+        """
+        with self._lock:
+            active = self._live()
+            if not active:
+                raise RuntimeError("No active workers")
+            return max(active, key=lambda w: _rendezvous_score(key, w.worker_id))
+
+    def add_inflight(self, worker: WorkerInfo, delta: int) -> None:
+        """
+        Counts tasks sent to `worker` and not yet answered.
+        """
+        with self._lock:
+            worker.inflight += delta
+
+    def observe_rtt(self, worker: WorkerInfo, elapsed: float, alpha: float = 0.2) -> None:
+        with self._lock:
+            if worker.rtt_ewma == 0.0:
+                # First sample seeds the average instead of being damped towards 0
+                worker.rtt_ewma = elapsed
+            else:
+                worker.rtt_ewma = (1 - alpha) * worker.rtt_ewma + alpha * elapsed
+
+
+def _rendezvous_score(key: str, worker_id: str) -> bytes:
+    # hashlib rather than hash(): str hashes are salted per process
+    return hashlib.blake2b(f"{key}\0{worker_id}".encode(), digest_size=8).digest()
+
+
+def _predicted_cost(w: WorkerInfo) -> float:
+    # Clamped so a stale or bogus report can never make a worker look free
+    return (max(w.load, 0.0) + max(w.inflight, 0) + 1) * (1 + w.rtt_ewma)
 
 
 registry = WorkerRegistry(ttl_seconds=45)
@@ -15,27 +15,27 @@ NullCondStr = ("is_null", "is_not_null")
 NullCond = Literal["is_null", "is_not_null"]
 
 
-@dataclass(frozen=False)
+@dataclass(frozen=False, slots=True)
 class ColumnRef:
     name: str
     alias: str | None = None
 
 
-@dataclass(frozen=False)
+@dataclass(frozen=False, slots=True)
 class AggExpr:
     func: AggFunc
     col: str | None
     alias: str | None = None
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class PredicateTerm:
     col: str
     op: Cmp | NullCond
     value: int | float | str | None | bool = None
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class SelectQuery:
     table: str
     select: list[ColumnRef | AggExpr] | Literal["*"]
@@ -43,21 +43,21 @@ class SelectQuery:
     group_by: list[str] | None
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class CreateQuery:
     table: str
     schema: list[ColumnInfo]
     if_not_exists: bool
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class InsertQuery:
     table: str
     src_path: str
     rows_per_shard: int | None = None
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class DropQuery:
     table: str
     if_exists: bool
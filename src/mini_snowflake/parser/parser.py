@@ -1,4 +1,8 @@
 import re
+import sys
+from collections.abc import Sequence
+from functools import lru_cache
+from itertools import pairwise
 from typing import cast
 
 from mini_snowflake.common.manifest import ColType, ColumnInfo
@@ -18,31 +22,65 @@ from mini_snowflake.parser.models import (
     SelectQuery,
 )
 
+# Hash-probe membership tests for the per-token keyword checks
+_AGG = frozenset(AggFuncStr)
+_CMP = frozenset(CmpStr)
+_NULL = frozenset(NullCondStr)
 
-def lower_outside_quotes(s: str) -> str:
-    parts = re.split(r"('.*?')", s)
-    return "".join(part if part.startswith("'") else part.lower() for part in parts)
 
+# Quoted literal (kept verbatim, spaces included), punctuation, or a bare word
+_TOKEN_RE = re.compile(r"'[^']*'|[(),;]|[^\s(),;']+|'")
 
-def preprocess_query(query: str) -> str:
-    query = lower_outside_quotes(query)
-    return (
-        query.replace("group by", "group_by")
-        .replace(",", " , ")
-        .replace("(", " ( ")
-        .replace(")", " ) ")
-        .replace("is null", "is_null")
-        .replace("is not null", "is_not_null")
-        .replace("if not exists", "if_not_exists")
-        .replace("if exists", "if_exists")
-        .replace("rows per shard", "rows_per_shard")
+# Multi-word keywords, fused into one token; longest phrase first per leading word
+_PHRASES: dict[str, tuple[tuple[tuple[str, ...], str], ...]] = {
+    "group": ((("by",), "group_by"),),
+    "is": ((("not", "null"), "is_not_null"), (("null",), "is_null")),
+    "if": ((("not", "exists"), "if_not_exists"), (("exists",), "if_exists")),
+    "rows": ((("per", "shard"), "rows_per_shard"),),
+}
+
+
+def tokenize(query: str) -> tuple[str, ...]:
+    """
+    Single scan: lowercases everything outside quotes, splits off punctuation and
+    fuses multi-word keywords.
+    """
+    words = tuple(
+        tok if tok[0] == "'" else tok.lower() for tok in _TOKEN_RE.findall(query)
     )
+    toks: list[str] = []
+    i, n = 0, len(words)
+    while i < n:
+        tok = words[i]
+        i += 1
+        for tail, fused in _PHRASES.get(tok, ()):
+            if words[i : i + len(tail)] == tail:
+                tok = fused
+                i += len(tail)
+                break
+        toks.append(sys.intern(tok))
+    return tuple(toks)
+
+
+def _split_on(toks: Sequence[str], sep: str) -> list[Sequence[str]]:
+    """
+    The runs of tokens between `sep` tokens, as slices of `toks`.
+    """
+    if not toks:
+        return []
+    bounds = [-1, *(i for i, tok in enumerate(toks) if tok == sep), len(toks)]
+    return [toks[a + 1 : b] for a, b in pairwise(bounds)]
 
 
+@lru_cache(maxsize=1024)
 def parse(query: str) -> SelectQuery | CreateQuery | InsertQuery | DropQuery:
-    query = preprocess_query(query)
-
-    toks = query.split()
+    """
+    Cached on the raw query text, so clients resending the same SQL skip parsing.
+    The returned AST is shared between callers and must be treated as read-only.
+    """
+    toks = tokenize(query)
+    if toks and toks[-1] == ";":
+        toks = toks[:-1]
     if toks[0] == "select":
         return parse_select(toks[1:])
     elif toks[0] == "create":
@@ -54,7 +92,7 @@ def parse(query: str) -> SelectQuery | CreateQuery | InsertQuery | DropQuery:
     raise ValueError(f"Error at token (0) {toks[0]}")
 
 
-def parse_drop(toks: list[str]) -> DropQuery:
+def parse_drop(toks: Sequence[str]) -> DropQuery:
     assert toks[0] == "table"
     if len(toks) == 2:
         return DropQuery(table=toks[1], if_exists=False)
@@ -65,7 +103,7 @@ def parse_drop(toks: list[str]) -> DropQuery:
         raise TypeError(f"Error parsing '{' '.join(toks)}': Invalid tokenization")
 
 
-def parse_insert(toks: list[str]) -> InsertQuery:
+def parse_insert(toks: Sequence[str]) -> InsertQuery:
     try:
         assert toks[0] == "into"
         table = toks[1]
@@ -83,7 +121,7 @@ def parse_insert(toks: list[str]) -> InsertQuery:
         raise TypeError(f"Error parsing '{' '.join(toks)}': {e}") from e
 
 
-def parse_create(toks: list[str]) -> CreateQuery:
+def parse_create(toks: Sequence[str]) -> CreateQuery:
     assert toks[0] == "table"
 
     if toks[-1] == "if_not_exists":
@@ -95,17 +133,7 @@ def parse_create(toks: list[str]) -> CreateQuery:
     assert toks[2] == "(" and toks[-1] == ")"
 
     table = toks[1]
-    schema = []
-    col = []
-    selected_toks = toks[3:-1]
-    for count, tok in enumerate(selected_toks):
-        if count == len(selected_toks) - 1:
-            col.append(tok)
-        if tok == "," or count == len(selected_toks) - 1:
-            schema.append(parse_create_col(col))
-            col = []
-        else:
-            col.append(tok)
+    schema = [parse_create_col(col) for col in _split_on(toks[3:-1], ",")]
 
     return CreateQuery(
         table=table,
@@ -114,7 +142,7 @@ def parse_create(toks: list[str]) -> CreateQuery:
     )
 
 
-def parse_create_col(toks: list[str]) -> ColumnInfo:
+def parse_create_col(toks: Sequence[str]) -> ColumnInfo:
     try:
         if len(toks) == 2:
             return ColumnInfo(
@@ -134,15 +162,27 @@ def parse_create_col(toks: list[str]) -> ColumnInfo:
         raise TypeError(f"Error parsing '{' '.join(toks)}': {e}") from e
 
 
-def parse_select(toks: list[str]) -> SelectQuery:
-    select_rows = parse_select_cols(toks[: toks.index("from")])
-    table_name = toks[toks.index("from") + 1]
-    if "where" in toks:
-        where_rows = parse_where(toks[toks.index("where") + 1 : toks.index("group_by")])
+_SELECT_KEYWORDS = frozenset(("from", "where", "group_by"))
+
+
+def parse_select(toks: Sequence[str]) -> SelectQuery:
+    # Offsets of the first occurrence of each clause keyword, found in one pass
+    kw: dict[str, int] = {}
+    for i, tok in enumerate(toks):
+        if tok in _SELECT_KEYWORDS and tok not in kw:
+            kw[tok] = i
+    from_i = kw["from"]
+    group_i = kw.get("group_by")
+    end = len(toks) if group_i is None else group_i
+
+    select_rows = parse_select_cols(toks[:from_i])
+    table_name = toks[from_i + 1]
+    if "where" in kw:
+        where_rows = parse_where(toks[kw["where"] + 1 : end])
     else:
         where_rows = None
-    if "group_by" in toks:
-        groupby_tables = parse_groupby(toks[toks.index("group_by") + 1 : -1])
+    if group_i is not None:
+        groupby_tables = parse_groupby(toks[group_i + 1 :])
     else:
         groupby_tables = None
 
@@ -154,23 +194,13 @@ def parse_select(toks: list[str]) -> SelectQuery:
     )
 
 
-def parse_select_cols(toks: list[str]):
-    res = []
-    col = []
-    for count, tok in enumerate(toks):
-        if count == len(toks) - 1:
-            col.append(tok)
-        if tok == "," or count == len(toks) - 1:
-            res.append(parse_select_col(col))
-            col = []
-        else:
-            col.append(tok)
-    return res
+def parse_select_cols(toks: Sequence[str]) -> list[ColumnRef | AggExpr]:
+    return [parse_select_col(col) for col in _split_on(toks, ",")]
 
 
-def parse_select_col(toks: list[str]):
+def parse_select_col(toks: Sequence[str]) -> ColumnRef | AggExpr:
     try:
-        if toks[0] in AggFuncStr:
+        if toks[0] in _AGG:
             assert toks[1] == "(" and toks[3] == ")"
             if len(toks) <= 4:
                 return AggExpr(
@@ -191,43 +221,36 @@ def parse_select_col(toks: list[str]):
                 return ColumnRef(name=toks[0], alias=toks[2])
         raise ValueError("Invalid Tokenization")
     except Exception as e:
-        print(f"Error parsing '{' '.join(toks)}': {e}")
-
-
-def parse_where(toks: list[str]):
-    res = []
-    expr = []
-    for count, tok in enumerate(toks):
-        if count == len(toks) - 1:
-            expr.append(tok)
-        if tok == "and" or count == len(toks) - 1:
-            res.append(parse_where_expr(expr))
-            expr = []
-        else:
-            expr.append(tok)
-    return res
+        raise TypeError(f"Error parsing '{' '.join(toks)}': {e}") from e
+
+
+def parse_where(toks: Sequence[str]) -> list[PredicateTerm]:
+    return [parse_where_expr(expr) for expr in _split_on(toks, "and")]
+
+
+# Integer or decimal literal, optionally negative; a fraction group makes it a float
+_NUM_RE = re.compile(r"-?(?:\d+(\.\d*)?|(\.\d+))")
 
 
 def num_cast(val: str) -> int | float | str:
-    if val.isdigit():
-        return int(val)
-    elif val.count(".") == 1 and val.replace(".", "").isdigit():
-        return float(val)
+    m = _NUM_RE.fullmatch(val)
+    if m:
+        return float(val) if m.group(1) or m.group(2) else int(val)
     elif val.startswith("'") and val.endswith("'"):
         return val[1:-1]
     raise ValueError(f"Cannot parse expresion {val}")
 
 
-def parse_where_expr(toks: list[str]):
+def parse_where_expr(toks: Sequence[str]) -> PredicateTerm:
     try:
         if len(toks) == 2:
-            assert toks[1] in NullCondStr
+            assert toks[1] in _NULL
             return PredicateTerm(
                 col=toks[0],
                 op=cast(NullCond, toks[1]),
             )
         elif len(toks) == 3:
-            assert toks[1] in CmpStr
+            assert toks[1] in _CMP
 
             value = num_cast(toks[2])
 
@@ -238,12 +261,12 @@ def parse_where_expr(toks: list[str]):
             )
         raise ValueError("Invalid Tokenization")
     except Exception as e:
-        print(f"Error parsing '{' '.join(toks)}': {e}")
+        raise TypeError(f"Error parsing '{' '.join(toks)}': {e}") from e
 
 
-def parse_groupby(toks: list[str]):
+def parse_groupby(toks: Sequence[str]) -> list[str]:
     if len(toks) == 1:
-        return toks
+        return list(toks)
 
     try:
         res = []
@@ -252,98 +275,7 @@ def parse_groupby(toks: list[str]):
                 res.append(tok)
             else:
                 assert tok == ","
-        raise ValueError("Invalid Tokenization")
+        return res
     except Exception as e:
-        print(f"Error parsing '{' '.join(toks)}': {e}")
-
-
-if __name__ == "__main__":
-    select_query_str = """
-        SELECT
-            event_type,
-            COUNT(*),
-            COUNT(user_id) as n_user_id_nonnull,
-            SUM(value) as total_value,
-            AVG(value) as avg_value,
-            MIN(event_time) as first_seen,
-            MAX(event_time) as last_seen
-        from events
-        where event_time >= '2025-01-01T00:00:00Z'
-            AND event_time <  '2025-02-01T00:00:00Z'
-            AND value >= 0
-            AND user_id IS NOT NULL
-        group by event_type
-    """
-
-    select_query_class = SelectQuery(
-        table="events",
-        select=[
-            ColumnRef(name="event_type"),
-            AggExpr(func="count", col="*"),
-            AggExpr(func="count", col="user_id", alias="n_user_id_nonnull"),
-            AggExpr(func="sum", col="value", alias="total_value"),
-            AggExpr(func="avg", col="value", alias="avg_value"),
-            AggExpr(func="min", col="event_time", alias="first_seen"),
-            AggExpr(func="max", col="event_time", alias="last_seen"),
-        ],
-        where=[
-            PredicateTerm(
-                col="event_time",
-                op=">=",
-                value="2025-01-01T00:00:00Z",
-            ),
-            PredicateTerm(
-                col="event_time",
-                op="<",
-                value="2025-02-01T00:00:00Z",
-            ),
-            PredicateTerm(
-                col="value",
-                op=">=",
-                value=0,
-            ),
-            PredicateTerm(
-                col="user_id",
-                op="is_not_null",
-                value=None,
-            ),
-        ],
-        group_by=["event_type"],
-    )
-
-    print(parse(select_query_str) == select_query_class)
-
-    create_query_str = """
-        CREATE TABLE events(
-            event_id    INT,
-            user_id     INT,
-            event_type  VARCHAR,
-            value       DOUBLE IS NOT NULL,
-            event_time  TIMESTAMP
-        ) IF NOT EXISTS
-    """
-
-    create_query_class = CreateQuery(
-        table="events",
-        schema=[
-            ColumnInfo(name="event_id", type="int"),
-            ColumnInfo(name="user_id", type="int"),
-            ColumnInfo(name="event_type", type="varchar"),
-            ColumnInfo(
-                name="value",
-                type="double",
-                nullable=False,
-            ),
-            ColumnInfo(name="event_time", type="timestamp"),
-        ],
-        if_not_exists=True,
-    )
-
-    print(parse(create_query_str) == create_query_class)
-
-    insert_query_str = "INSERT INTO events FROM data/path ROWS_PER_SHARD 2"
-    insert_query_class = InsertQuery(
-        table="events", src_path="data/path", rows_per_shard=2
-    )
+        raise TypeError(f"Error parsing '{' '.join(toks)}': {e}") from e
 
-    print(parse(create_query_str) == create_query_class)
@@ -1,14 +1,18 @@
 from __future__ import annotations
 
 import logging
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any
 
 from fastapi import APIRouter
-from mini_snowflake.common.db_conn import DBConn
+from mini_snowflake.common.db_conn import DBConn, get_db_conn
 from mini_snowflake.common.utils import setup_logging
 from mini_snowflake.worker.worker import (
     worker_create,
     worker_drop,
     worker_insert,
+    worker_insert_many,
     worker_select,
 )
 
@@ -26,35 +30,95 @@ logger = logging.getLogger("")
 router = APIRouter()
 
 
-@router.post("/tasks/execute", response_model=TaskResponse)
-def execute_task(
-    task: CreateRequest | DropRequest | InsertRequest | SelectRequest,
-) -> TaskResponse:
-    """
-    Single internal endpoint for all tasks.
-    For now only CreateQuery is wired.
-    """
-    logger.info(f"Executing request {task}")
-    try:
-        conn = DBConn(task.db_path)
-        logger.info("Established conn")
+Task = CreateRequest | DropRequest | InsertRequest | SelectRequest
 
-        if isinstance(task, CreateRequest):
-            result = worker_create(conn, task)
-        elif isinstance(task, DropRequest):
-            result = worker_drop(conn, task)
-        elif isinstance(task, InsertRequest):
-            result = worker_insert(conn, task)
-        elif isinstance(task, SelectRequest):
-            result = worker_select(conn, task)
+_HANDLERS: dict[type, Callable[[DBConn, Any], Any]] = {
+    CreateRequest: worker_create,
+    DropRequest: worker_drop,
+    InsertRequest: worker_insert,
+    SelectRequest: worker_select,
+}
 
-        if result is not None:
-            return TaskResponse(ok=True, result=result)
 
+def _execute(task: Task) -> TaskResponse:
+    logger.info(f"Executing request {task}")
+    handler = _HANDLERS.get(type(task))
+    if handler is None:
         return TaskResponse(
             ok=False, error=f"Unsupported task type: {type(task).__name__}"
         )
+    conn: DBConn | None = None
+    try:
+        conn = get_db_conn(task.db_path)
+        logger.info("Established conn")
+        return TaskResponse(ok=True, result=handler(conn, task))
 
     except Exception as e:
         logger.exception("Failed task")
+        # A failed task may have left an unsaved catalog edit on the cached conn.
+        # Only its caches are dropped: the conn, and the table locks, stay shared.
+        if conn is not None:
+            conn.reset_cache()
         return TaskResponse(ok=False, error=str(e))
+
+
+# Runs the parts of a task batch side by side, as separate requests would be
+_BATCH_POOL = ThreadPoolExecutor(max_workers=32, thread_name_prefix="batch-task")
+
+
+def _insert_key(task: InsertRequest) -> tuple[str, str, int | None]:
+    return (task.db_path, task.table, task.rows_per_shard)
+
+
+def _execute_inserts(tasks: list[InsertRequest]) -> list[TaskResponse]:
+    """
+    Runs adjacent inserts into one table as a single write and manifest save.
+    If the combined insert fails, each one is retried alone to report its own error.
+    """
+    if len(tasks) == 1:
+        return [_execute(tasks[0])]
+    logger.info(f"Coalescing {len(tasks)} inserts into '{tasks[0].table}'")
+    conn: DBConn | None = None
+    try:
+        conn = get_db_conn(tasks[0].db_path)
+        result = worker_insert_many(conn, tasks)
+    except Exception:
+        logger.exception("Coalesced insert failed, retrying one by one")
+        if conn is not None:
+            conn.reset_cache()
+        return [_execute(task) for task in tasks]
+    return [TaskResponse(ok=True, result=result) for _ in tasks]
+
+
+@router.post("/tasks/execute", response_model=TaskResponse)
+def execute_task(task: Task) -> TaskResponse:
+    """
+    Single internal endpoint for all tasks.
+    """
+    return _execute(task)
+
+
+@router.post("/tasks/execute_batch", response_model=list[TaskResponse])
+def execute_batch(tasks: list[Task]) -> list[TaskResponse]:
+    """
+    Runs coalesced tasks concurrently, merging inserts into the same table;
+    one failing task does not stop the rest. Responses keep the request order.
+    """
+    if len(tasks) == 1:
+        return [_execute(tasks[0])]
+    singles: list[tuple[int, Future[TaskResponse]]] = []
+    inserts: dict[tuple[str, str, int | None], list[tuple[int, InsertRequest]]] = {}
+    for i, task in enumerate(tasks):
+        if isinstance(task, InsertRequest):
+            inserts.setdefault(_insert_key(task), []).append((i, task))
+        else:
+            singles.append((i, _BATCH_POOL.submit(_execute, task)))
+    merged = [
+        ([i for i, _ in group], _BATCH_POOL.submit(_execute_inserts, [t for _, t in group]))
+        for group in inserts.values()
+    ]
+
+    responses: dict[int, TaskResponse] = {i: fut.result() for i, fut in singles}
+    for indices, fut in merged:
+        responses.update(zip(indices, fut.result(), strict=True))
+    return [responses[i] for i in range(len(tasks))]
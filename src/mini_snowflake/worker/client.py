@@ -2,46 +2,54 @@
 
 from __future__ import annotations
 
-import time
+import asyncio
+import random
+from typing import Any
 
 import requests
+from requests.adapters import HTTPAdapter
 
 from .config import WorkerConfig
 
+# One keep-alive connection to the orchestrator, reused by every register/heartbeat
+_SESSION = requests.Session()
+_SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=0))
+_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=0))
 
-def register_once_with_retries(cfg: WorkerConfig) -> None:
+
+def _post(cfg: WorkerConfig, endpoint: str, payload: dict[str, Any]) -> int | None:
+    """
+    Status code of the orchestrator's reply, None if it couldn't be reached.
+    """
+    try:
+        r = _SESSION.post(f"{cfg.orchestrator_url}{endpoint}", json=payload, timeout=5)
+        return r.status_code
+    except Exception:
+        return None
+
+
+async def register_once_with_retries(cfg: WorkerConfig) -> None:
     payload = {"worker_id": cfg.worker_id, "load": 0.0}
 
     while True:
-        try:
-            r = requests.post(
-                f"{cfg.orchestrator_url}/workers/register", json=payload, timeout=5
-            )
-            if r.status_code < 400:
-                return
-        except Exception:
-            pass
-        time.sleep(1)
-
-
-def heartbeat_forever(cfg: WorkerConfig) -> None:
-    while True:
-        payload = {"worker_id": cfg.worker_id, "load": 0.0}
+        status = await asyncio.to_thread(_post, cfg, "/workers/register", payload)
+        if status is not None and status < 400:
+            return
+        await asyncio.sleep(1)
 
-        try:
-            r = requests.post(
-                f"{cfg.orchestrator_url}/workers/heartbeat", json=payload, timeout=5
-            )
 
-            if r.status_code == 404:
-                register_once_with_retries(cfg)
+async def heartbeat_forever(cfg: WorkerConfig) -> None:
+    while True:
+        payload = {"worker_id": cfg.worker_id, "load": 0.0}
 
-        except Exception:
-            pass
+        status = await asyncio.to_thread(_post, cfg, "/workers/heartbeat", payload)
+        if status == 404:
+            await register_once_with_retries(cfg)
 
-        time.sleep(cfg.heartbeat_seconds)
+        # +-20% jitter so workers started together don't heartbeat in lock-step
+        await asyncio.sleep(cfg.heartbeat_seconds * random.uniform(0.8, 1.2))
 
 
-def registration_and_heartbeat_loop(cfg: WorkerConfig) -> None:
-    register_once_with_retries(cfg)
-    heartbeat_forever(cfg)
+async def registration_and_heartbeat_loop(cfg: WorkerConfig) -> None:
+    await register_once_with_retries(cfg)
+    await heartbeat_forever(cfg)
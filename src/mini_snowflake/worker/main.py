@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 
-import threading
+import asyncio
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
@@ -18,6 +18,9 @@ from .config import load_config
 async def lifespan(app: FastAPI):
     """
     This replaces @app.on_event("startup") and @app.on_event("shutdown").
+
+    Routes that only touch memory are `async def` and run on this loop; the
+    task routes call DuckDB/pyarrow and stay sync so FastAPI offloads them.
     """
     cfg = load_config()
 
@@ -26,21 +29,20 @@ async def lifespan(app: FastAPI):
         threads=getattr(cfg, "duckdb_threads", 1),
     )
 
-    # Start background heartbeat thread BEFORE the app starts serving
-    thread = threading.Thread(
-        target=registration_and_heartbeat_loop,
-        args=(cfg,),
-        daemon=True,
-    )
-    thread.start()
+    # Start heartbeating on the app's event loop BEFORE the app starts serving
+    heartbeat = asyncio.create_task(registration_and_heartbeat_loop(cfg))
 
     yield
 
+    # Wait for the loop to unwind so shutdown never races an in-flight heartbeat
+    heartbeat.cancel()
+    await asyncio.gather(heartbeat, return_exceptions=True)
+
 
 app = FastAPI(title="Worker", lifespan=lifespan)
 app.include_router(router)
 
 
 @app.get("/health")
-def health():
+async def health():
     return {"ok": True}
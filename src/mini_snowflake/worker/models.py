@@ -22,6 +22,8 @@ class InsertRequest(BaseModel):
     table: str
     src_path: str
     rows_per_shard: int | None = None
+    # Drop source columns the table doesn't have instead of rejecting the file
+    ignore_extra_columns: bool = False
 
 
 class SelectRequest(BaseModel):
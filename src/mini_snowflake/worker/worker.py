@@ -1,15 +1,24 @@
+import csv
 import logging
+import os
+import queue
 import re
 import shutil
+from collections.abc import Iterable, Iterator, Sequence
+from contextlib import contextmanager
 from functools import lru_cache
 from pathlib import Path
+from uuid import uuid4
 
 import duckdb
-import pandas as pd
 import pyarrow as pa
+import pyarrow.csv as pacsv
 import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 from mini_snowflake.common.db_conn import DBConn
-from mini_snowflake.common.manifest import Manifest
+from mini_snowflake.common.io_parquet import SHARD_WRITE_OPTIONS
+from mini_snowflake.common.manifest import Manifest, ScalarType, ShardStats
+from mini_snowflake.common.types import DUCKDB_TO_ARROW
 from mini_snowflake.common.utils import setup_logging
 
 from .models import CreateRequest, DropRequest, InsertRequest, SelectRequest
@@ -17,60 +26,40 @@ from .models import CreateRequest, DropRequest, InsertRequest, SelectRequest
 setup_logging()
 logger = logging.getLogger("")
 
-DUCKDB_TO_ARROW: dict[str, pa.DataType] = {
-    # integers
-    "tinyint": pa.int8(),
-    "smallint": pa.int16(),
-    "integer": pa.int32(),
-    "int": pa.int32(),
-    "bigint": pa.int64(),
-    "hugeint": pa.int64(),
-    "bignum": pa.decimal128(38, 0),
-    "utinyint": pa.uint8(),
-    "usmallint": pa.uint16(),
-    "uinteger": pa.uint32(),
-    "ubigint": pa.uint64(),
-    "uhugeint": pa.uint64(),
-    # floats / decimals
-    "float": pa.float32(),
-    "real": pa.float32(),
-    "double": pa.float64(),
-    "decimal": pa.decimal128(
-        38, 10
-    ),  # if you don't store precision/scale, pick a default
-    "numeric": pa.decimal128(38, 10),
-    # boolean
-    "boolean": pa.bool_(),
-    "bool": pa.bool_(),
-    # strings
-    "varchar": pa.string(),
-    "text": pa.string(),
-    "string": pa.string(),
-    "char": pa.string(),
-    "uuid": pa.string(),
-    "bit": pa.string(),
-    # binary
-    "blob": pa.binary(),
-    "bytea": pa.binary(),
-    "varbinary": pa.binary(),
-    # temporal
-    "date": pa.date32(),
-    "time": pa.time64("us"),
-    "timestamp": pa.timestamp("us"),
-    "timestamptz": pa.timestamp("us", tz="UTC"),
-    "interval": pa.duration("us"),
-}
+DUCK: duckdb.DuckDBPyConnection | None = None
+# Idle cursors on DUCK, reused across tasks instead of reopened per call
+_CURSORS: queue.SimpleQueue[duckdb.DuckDBPyConnection] = queue.SimpleQueue()
 
 def init_worker(db_path: str, threads: int = 1):
-    global DUCK
+    global DUCK, _CURSORS
     DUCK = duckdb.connect(db_path)
+    _CURSORS = queue.SimpleQueue()
     DUCK.execute(f"PRAGMA threads={threads}")
+    # Plan SQL never relies on row order; lets COPY stream and honour ROW_GROUP_SIZE_BYTES
+    DUCK.execute("SET preserve_insertion_order=false")
 
 def get_conn() -> duckdb.DuckDBPyConnection:
     if DUCK is None:
         raise RuntimeError("DuckDB not initialized. Call init_worker() at startup.")
     return DUCK
 
+@contextmanager
+def _cursor() -> Iterator[duckdb.DuckDBPyConnection]:
+    """
+    Borrows an idle cursor on the shared DB, opening one only when all are busy.
+    A cursor whose query failed is closed rather than returned to the pool.
+    """
+    try:
+        cur = _CURSORS.get_nowait()
+    except queue.Empty:
+        cur = get_conn().cursor()
+    try:
+        yield cur
+    except BaseException:
+        cur.close()
+        raise
+    _CURSORS.put(cur)
+
 
 def worker_create(
     conn: DBConn,
@@ -133,80 +122,175 @@ def worker_drop(
     return f"Successfully dropped table '{table}'"
 
 
+_SHARD_RE = re.compile(r"shard-([^.]+)\.parquet")
+
+
 def _get_shard_i(path: str) -> int:
-    match = re.search(r"shard-([^.]+)\.parquet", path)
+    match = _SHARD_RE.search(path)
     return int(match.group(1)) if match else 0
 
 
-def _validate_insert_table(tb: pa.Table, manifest: Manifest) -> pa.Table:
+# Case-insensitive view of DUCKDB_TO_ARROW
+_TYPE_MAP: dict[str, pa.DataType] = {k.casefold(): v for k, v in DUCKDB_TO_ARROW.items()}
+
+
+def _arrow_type(col_type: str) -> pa.DataType:
+    arrow_type = _TYPE_MAP.get(str(col_type).strip().casefold())
+    if arrow_type is None:
+        raise ValueError(f"Unsupported column type: {col_type!r}")
+    return arrow_type
+
+
+@lru_cache(maxsize=32)
+def _target_schema(schema_tuple: tuple[tuple[str, str, bool], ...]) -> pa.Schema:
+    # NOT NULL columns are declared required, as in the benchmark generator's shards
+    return pa.schema(
+        [
+            pa.field(name, _arrow_type(col_type), nullable=nullable)
+            for name, col_type, nullable in schema_tuple
+        ]
+    )
+
+
+@lru_cache(maxsize=32)
+def _not_null_columns(schema_tuple: tuple[tuple[str, str, bool], ...]) -> tuple[str, ...]:
+    return tuple(name for name, _, nullable in schema_tuple if not nullable)
+
+
+@lru_cache(maxsize=32)
+def _bounded_columns(schema_tuple: tuple[tuple[str, str, bool], ...]) -> frozenset[str]:
     """
-    Validates:
-      - all manifest columns exist in the incoming table
-      - nullability constraints (nullable=False)
-      - cocast columns to target Arrow types
-    Returns a casted table (so downstream parquet files have canonical types).
+    Columns whose Parquet min/max are safe to prune on. Floats are left out:
+    their statistics skip NaN, which DuckDB orders above every other value.
     """
-    expected = {c.name: c for c in manifest.schema}
-    incoming_names = set(tb.schema.names)
+    return frozenset(
+        name
+        for name, col_type, _ in schema_tuple
+        if pa.types.is_integer(t := _arrow_type(col_type)) or pa.types.is_string(t)
+    )
+
 
-    missing = [name for name in expected.keys() if name not in incoming_names]
+def _shard_stats(path: str | Path, bounded: frozenset[str]) -> ShardStats:
+    """
+    Folds the row-group statistics from a shard's footer into one ShardStats.
+    """
+    md = pq.read_metadata(path)
+    null_counts: dict[str, int] = {}
+    mins: dict[str, ScalarType] = {}
+    maxs: dict[str, ScalarType] = {}
+    for i, name in enumerate(md.schema.names):
+        chunks = [md.row_group(g) for g in range(md.num_row_groups)]
+        stats = [rg.column(i).statistics for rg in chunks]
+        if not all(st is not None and st.has_null_count for st in stats):
+            continue
+        null_counts[name] = sum(st.null_count for st in stats)
+        if name not in bounded:
+            continue
+        # Row groups that are all null carry no bounds and cannot widen them
+        ranged = [st for st, rg in zip(stats, chunks, strict=True) if st.null_count < rg.num_rows]
+        if ranged and all(st.has_min_max for st in ranged):
+            mins[name] = min(st.min for st in ranged)
+            maxs[name] = max(st.max for st in ranged)
+    return ShardStats(rows=md.num_rows, null_counts=null_counts, mins=mins, maxs=maxs)
+
+
+def _validate_insert_schema(
+    names: Sequence[str], manifest: Manifest, ignore_extra_columns: bool = False
+) -> None:
+    """
+    Checks a source's column names against the manifest before any data is read.
+    """
+    expected = {c.name for c in manifest.schema}
+    incoming_names = set(names)
+
+    missing = [c.name for c in manifest.schema if c.name not in incoming_names]
     if missing:
         raise ValueError(f"Missing required columns: {missing}")
 
-    # Forbid extras
-    extras = [name for name in tb.schema.names if name not in expected]
-    if extras:
+    # Forbid extras unless the caller opted to drop them
+    extras = [name for name in names if name not in expected]
+    if extras and not ignore_extra_columns:
         raise ValueError(f"Unexpected columns: {extras}")
 
-    tb = tb.select([c.name for c in manifest.schema])
 
-    # Nullability + castability
-    cast_arrays = []
-    for col in manifest.schema:
-        arr = tb[col.name]
-        if not col.nullable:
-            if arr.null_count > 0:
-                raise ValueError(
-                    f"Column '{col.name}' is NOT NULL but has {arr.null_count} nulls"
-                )
+def _source_columns(src_path: Path) -> list[str]:
+    """
+    Column names from a CSV header line or a Parquet footer.
+    """
+    if src_path.suffix.lower() == ".csv":
+        with open(src_path, newline="", encoding="utf-8-sig") as f:
+            return next(csv.reader(f), [])
+    names: list[str] = pq.read_schema(src_path).names
+    return names
 
-        target_type = DUCKDB_TO_ARROW[str(col.type)]
-        try:
-            cast_arrays.append(pa.compute.cast(arr, target_type, safe=True))
-        except Exception as e:
-            raise TypeError(
-                f"Column '{col.name}' cannot be safely cast from {arr.type} to {target_type}"
-            ) from e
 
-    return pa.table(cast_arrays, names=[c.name for c in manifest.schema])
+def _validate_insert_batch(
+    batch: pa.RecordBatch, manifest: Manifest, target_schema: pa.Schema
+) -> pa.RecordBatch:
+    """
+    Validates:
+      - nullability constraints (nullable=False)
+      - cocast columns to target Arrow types
+    Returns a casted batch (so downstream parquet files have canonical types).
+    """
+    batch = batch.select(target_schema.names)
+    # null_count is kept on each array, so this never rescans validity bitmaps
+    for name in _not_null_columns(manifest.schema_tuple):
+        null_count = batch.column(name).null_count
+        if null_count > 0:
+            raise ValueError(f"Column '{name}' is NOT NULL but has {null_count} nulls")
+
+    # One vectorized cast; only walk the columns to name the culprit on failure
+    try:
+        return batch.cast(target_schema, safe=True)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+        for arr, field in zip(batch.columns, target_schema, strict=True):
+            try:
+                pa.compute.cast(arr, field.type, safe=True)
+            except Exception:
+                raise TypeError(
+                    f"Column '{field.name}' cannot be safely cast from {arr.type} to {field.type}"
+                ) from e
+        raise
+
+
+def _open_insert_source(
+    src_path: Path, manifest: Manifest, rows_per_shard: int
+) -> Iterable[pa.RecordBatch]:
+    """
+    Streams only the manifest's columns of a source file into Arrow batches,
+    parsing CSV columns as their manifest types.
+    """
+    target_schema = _target_schema(manifest.schema_tuple)
+    wanted = target_schema.names
+    if src_path.suffix.lower() == ".csv":
+        convert_options = pacsv.ConvertOptions(
+            column_types=dict(zip(wanted, target_schema.types, strict=True)),
+            strings_can_be_null=True,
+            include_columns=wanted,
+        )
+        csv_reader: Iterable[pa.RecordBatch] = pacsv.open_csv(
+            src_path, convert_options=convert_options
+        )
+        return csv_reader
+    batches: Iterable[pa.RecordBatch] = pq.ParquetFile(src_path).iter_batches(
+        batch_size=rows_per_shard, columns=wanted
+    )
+    return batches
 
 
-def worker_insert(
+def _append_shards(
     conn: DBConn,
-    request: InsertRequest,
-):
-    logger.info(f"worker_insert({request})")
-    table = request.table
-    src_path = Path(request.src_path)
-    rows_per_shard = request.rows_per_shard
-
-    suffix = src_path.suffix.lower()
-    if suffix == ".csv":
-        df = pd.read_csv(src_path)
-    elif suffix in {".parquet", ".pq"}:
-        df = pd.read_parquet(src_path)
-    else:
-        raise ValueError(f"Unsupported file type: {suffix}")
-
+    table: str,
+    sources: list[tuple[Path, bool]],
+    rows_per_shard: int | None,
+) -> None:
+    """
+    Writes the sources as new shards and records them in the manifest.
+    Callers hold `conn.table_lock(table)`.
+    """
     table_path = conn.path / table
-    if not table_path.exists():
-        raise NameError(f"Table '{table}' doesn't exist")
-
-    manifest_path = table_path / "manifest.json"
-    if not manifest_path.exists():
-        raise NameError(f"Table '{table}' doesn't have a Manifest")
-
-    manifest = Manifest.load(manifest_path)
+    manifest = conn.manifest(table)
     if manifest.shards == []:
         last_shard = 0
     else:
@@ -216,29 +300,97 @@ def worker_insert(
         rows_per_shard if rows_per_shard is not None else manifest.rows_per_shard
     )
 
-    # Convert to Arrow
-    tb = pa.Table.from_pandas(df, preserve_index=False)
-    tb = _validate_insert_table(tb, manifest)
-
-    # Write shards
-    ds.write_dataset(
-        data=tb,
-        base_dir=str(table_path),
-        format="parquet",
-        max_rows_per_file=rows_per_shard,
-        max_rows_per_group=rows_per_shard,
-        existing_data_behavior="overwrite_or_ignore",
-        basename_template="tmp_shard-{i}.parquet",
+    # Types are resolved and column names checked for every source before any data is read
+    target_schema = _target_schema(manifest.schema_tuple)
+    for src_path, ignore_extra_columns in sources:
+        _validate_insert_schema(_source_columns(src_path), manifest, ignore_extra_columns)
+    readers = [_open_insert_source(p, manifest, rows_per_shard) for p, _ in sources]
+    reader = pa.RecordBatchReader.from_batches(
+        target_schema,
+        (_validate_insert_batch(b, manifest, target_schema) for src in readers for b in src),
     )
 
-    for p in sorted(table_path.glob("tmp_shard-*.parquet")):
-        i = int(p.stem.split("-")[1])
-        shard_i_name = f"shard-{last_shard + i}.parquet"
-        p.rename(table_path / shard_i_name)
-        manifest.shards += [shard_i_name]
+    # Write shards, one batch in memory at a time, into a directory of this insert's own
+    # so a failure never touches files another writer has in flight
+    tmp_dir = table_path / f"_tmp-{uuid4().hex}"
+    tmp_dir.mkdir()
+    try:
+        ds.write_dataset(
+            data=reader,
+            base_dir=str(tmp_dir),
+            format="parquet",
+            file_options=ds.ParquetFileFormat().make_write_options(**SHARD_WRITE_OPTIONS),
+            max_rows_per_file=rows_per_shard,
+            max_rows_per_group=rows_per_shard,
+            # Coalesce small source batches so row groups keep useful statistics
+            min_rows_per_group=rows_per_shard // 4,
+            use_threads=True,
+            basename_template="tmp_shard-{i}.parquet",
+        )
+        # One directory scan and one sort, then a single extend of the shard list
+        written = sorted((_get_shard_i(e.name), e.path) for e in os.scandir(tmp_dir))
+        new_shards = [f"shard-{last_shard + i}.parquet" for i, _ in written]
+        for (_, tmp_path), shard_name in zip(written, new_shards, strict=True):
+            os.rename(tmp_path, table_path / shard_name)
+    finally:
+        # A bad batch can fail the write midway: drop whatever it left behind
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    manifest.shards.extend(new_shards)
+    bounded = _bounded_columns(manifest.schema_tuple)
+    for shard_name in new_shards:
+        manifest.shard_stats[shard_name] = _shard_stats(table_path / shard_name, bounded)
 
     # Manifest save
-    manifest.save(manifest_path)
+    conn.save_manifest(table, manifest)
+
+
+def worker_insert(
+    conn: DBConn,
+    request: InsertRequest,
+):
+    return worker_insert_many(conn, [request])
+
+
+def worker_insert_many(
+    conn: DBConn,
+    requests: Sequence[InsertRequest],
+) -> str:
+    """
+    Appends every request's source to one table as a single shard write and
+    manifest save. All requests must share `table` and `rows_per_shard`.
+    """
+    for request in requests:
+        logger.info(f"worker_insert({request})")
+    table = requests[0].table
+    rows_per_shard = requests[0].rows_per_shard
+    if any((r.table, r.rows_per_shard) != (table, rows_per_shard) for r in requests):
+        raise ValueError("Coalesced inserts must share table and rows_per_shard")
+    src_paths = [Path(r.src_path) for r in requests]
+
+    for src_path in src_paths:
+        suffix = src_path.suffix.lower()
+        if suffix not in {".csv", ".parquet", ".pq"}:
+            raise ValueError(f"Unsupported file type: {suffix}")
+
+    table_path = conn.path / table
+    if not table_path.exists():
+        raise NameError(f"Table '{table}' doesn't exist")
+
+    manifest_path = table_path / "manifest.json"
+    if not manifest_path.exists():
+        raise NameError(f"Table '{table}' doesn't have a Manifest")
+
+    with conn.table_lock(table):
+        try:
+            sources = [
+                (p, r.ignore_extra_columns) for p, r in zip(src_paths, requests, strict=True)
+            ]
+            _append_shards(conn, table, sources, rows_per_shard)
+        except BaseException:
+            # The cached manifest may hold a half-applied edit
+            conn.forget_manifest(table)
+            raise
 
     # Output
     return f"Successfully inserted data into table '{table}'"
@@ -248,6 +400,16 @@ def worker_select(
     conn: DBConn,
     request: SelectRequest,
 ) -> str:
-    duckconn = get_conn()
-    duckconn.execute(request.raw_query).fetchall()
-    return f"Successfully executed query {' '.join(request.raw_query.split())}"
+    query = " ".join(request.raw_query.split())
+    is_copy = query[:5].lower() == "copy "
+    # Tasks can arrive concurrently: each one runs on its own cursor on the shared DB
+    with _cursor() as duckconn:
+        # Drain as Arrow batches: constant memory and no per-row Python objects
+        reader = duckconn.execute(request.raw_query).fetch_record_batch(1_000_000)
+        if is_copy:
+            # COPY ... TO answers with a single Count row: the rows it wrote
+            n_rows = sum(pa.compute.sum(batch.column(0)).as_py() or 0 for batch in reader)
+        else:
+            n_rows = sum(batch.num_rows for batch in reader)
+    verb = "wrote" if is_copy else "returned"
+    return f"Successfully executed query {query} ({verb} {n_rows} rows)"